@@ -0,0 +1,4 @@
+from async_app import create_async_app
+
+# entry point for uvicorn, serving the async read path: `uvicorn asgi:app`
+app = create_async_app()
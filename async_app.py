@@ -0,0 +1,183 @@
+import asyncio
+import importlib
+import itertools
+from contextlib import asynccontextmanager, nullcontext
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route
+from werkzeug.exceptions import HTTPException
+from views import api
+
+#----------------------------------------------------------------------------#
+# Async read path.
+#----------------------------------------------------------------------------#
+
+# the GET endpoints of /api/v1 (listings, search, details, availability,
+# recommendations) served by an ASGI app on an asyncpg engine, so a worker
+# keeps thousands of requests in flight while they wait on Postgres instead
+# of one per thread. Statements are built by views/api.py from the models
+# in models.py, and the JSON is the same as the Flask endpoints'; writes and
+# the HTML pages stay on the WSGI app. Run it next to gunicorn, with the
+# proxy sending GET /api/v1/ here:
+#
+#   uvicorn --workers 4 asgi:app
+
+def load_config(name):
+    # the uppercase settings of a config module, as Flask's from_object reads them
+    module = importlib.import_module(name)
+    return {key: getattr(module, key) for key in dir(module) if key.isupper()}
+
+
+def create_engine(uri, config):
+    # the sync engine's pool options; behind PgBouncer asyncpg must not
+    # cache prepared statements either (see DB_PGBOUNCER)
+    url = make_url(uri).set(drivername='postgresql+asyncpg')
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if config.get('DB_PGBOUNCER'):
+        url = url.update_query_dict({'prepared_statement_cache_size': '0'})
+        options['connect_args'] = {'statement_cache_size': 0}
+    return create_async_engine(url, **options)
+
+
+class Engines(object):
+    # the primary and the read replicas, picked round-robin like use_replica
+
+    def __init__(self, config):
+        self.primary = create_engine(config['SQLALCHEMY_DATABASE_URI'], config)
+        self.replicas = [create_engine(uri, config) for uri in config.get('SQLALCHEMY_REPLICA_URIS') or []]
+        self.cycle = itertools.cycle(self.replicas or [self.primary])
+        # requests wait for a connection in arrival order; the pool's own
+        # queue lets newcomers take a returned connection ahead of requests
+        # already waiting, which starves some of them under load. Each engine
+        # has its own pool, so each gets its own queue
+        options = config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+        self.slots = {}
+        if 'pool_size' in options:
+            self.slots = {
+                engine: asyncio.Semaphore(options['pool_size'] + options.get('max_overflow', 0))
+                for engine in [self.primary] + self.replicas}
+
+    def pick(self):
+        return next(self.cycle)
+
+    def slot(self, engine):
+        return self.slots.get(engine) or nullcontext()
+
+    async def dispose(self):
+        for engine in [self.primary] + self.replicas:
+            await engine.dispose()
+
+
+async def fetch(request, statement):
+    return await execute(request.app.state.engines, statement)
+
+
+async def execute(engines, statement):
+    # a replica that fails the statement is retried once on the primary,
+    # queueing for a primary connection like any other primary read
+    engine = engines.pick()
+    try:
+        return await run(engines, engine, statement)
+    except (DBAPIError, OSError):
+        if engine is engines.primary:
+            raise
+    return await run(engines, engines.primary, statement)
+
+
+async def run(engines, engine, statement):
+    async with engines.slot(engine):
+        async with engine.connect() as connection:
+            return (await connection.execute(statement)).all()
+
+
+def json_response(body, status=200):
+    return Response(api.dumps(body), status_code=status, media_type='application/json')
+
+
+def endpoint(handler):
+    async def wrapper(request):
+        try:
+            return json_response(await handler(request))
+        except HTTPException as error:
+            return json_response({'error': error.description}, error.code)
+    return wrapper
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+def list_people(kind):
+    async def handler(request):
+        config = request.app.state.config
+        statement, fields, limit = api.people_query(kind, request.query_params, config)
+        return api.people_page(kind, fields, limit, await fetch(request, statement))
+    return endpoint(handler)
+
+
+async def shows(request):
+    statement, fields, limit = api.shows_query(request.query_params, request.app.state.config)
+    return api.shows_page(fields, limit, await fetch(request, statement))
+
+
+def search_people(kind):
+    async def handler(request):
+        statement, fields = api.search_query(kind, request.query_params, request.app.state.config)
+        return api.search_page(kind, fields, await fetch(request, statement))
+    return endpoint(handler)
+
+
+def detail(kind):
+    async def handler(request):
+        id = request.path_params['id']
+        statement, fields = api.detail_query(kind, id, request.query_params)
+        return api.detail_body(kind, id, fields, await fetch(request, statement))
+    return endpoint(handler)
+
+
+def recommended(kind):
+    async def handler(request):
+        id = request.path_params['id']
+        return api.recommendations_body(kind, id, await fetch(request, api.recommendations_query(kind, id)))
+    return endpoint(handler)
+
+
+def availability(kind):
+    async def handler(request):
+        id = request.path_params['id']
+        statement, start, end = api.availability_query(kind, id, request.query_params, request.app.state.config)
+        return api.availability_body(kind, id, start, end, await fetch(request, statement))
+    return endpoint(handler)
+
+#----------------------------------------------------------------------------#
+# App Config.
+#----------------------------------------------------------------------------#
+
+def create_async_app(config='config'):
+    config = load_config(config)
+    engines = Engines(config)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        await engines.dispose()
+
+    app = Starlette(routes=[
+        Route('/api/v1/venues', list_people('venues')),
+        Route('/api/v1/artists', list_people('artists')),
+        Route('/api/v1/shows', endpoint(shows)),
+        Route('/api/v1/venues/search', search_people('venues')),
+        Route('/api/v1/artists/search', search_people('artists')),
+        Route('/api/v1/venues/{id:int}', detail('venues')),
+        Route('/api/v1/artists/{id:int}', detail('artists')),
+        Route('/api/v1/shows/{id:int}', detail('shows')),
+        Route('/api/v1/venues/{id:int}/recommendations', recommended('venues')),
+        Route('/api/v1/artists/{id:int}/recommendations', recommended('artists')),
+        Route('/api/v1/venues/{id:int}/availability', availability('venues')),
+        Route('/api/v1/artists/{id:int}/availability', availability('artists')),
+    ], lifespan=lifespan)
+    app.state.config = config
+    app.state.engines = engines
+    return app
@@ -0,0 +1,110 @@
+"""Compare the /api/v1 JSON endpoints with the HTML pages they replace.
+
+    python -m benchmarks.api --iterations 50 --output api.json
+
+Each pair asks the HTML route and its API counterpart for the same data
+(same page sizes, the same venue or artist), times both with the response
+cache off, and reports p50/p95 latency, SQL statements per request and the
+size of one response of each, with the API's share of the HTML latency.
+"""
+import argparse
+import json
+import sys
+from datetime import datetime
+
+from app import create_app
+from models import Artist, Venue, Show
+from benchmarks.run import Picker, VENUE_FORM, git_revision, run_scenario
+
+# name: (HTML request, API request), each a scenario as in benchmarks.run
+PAIRS = {
+    'venues': (
+        lambda pick: ('GET', '/venues', None),
+        lambda pick: ('GET', '/api/v1/venues?limit=200', None),
+    ),
+    'artists': (
+        lambda pick: ('GET', '/artists', None),
+        lambda pick: ('GET', '/api/v1/artists?limit=100', None),
+    ),
+    'shows': (
+        lambda pick: ('GET', '/shows', None),
+        lambda pick: ('GET', '/api/v1/shows?limit=30', None),
+    ),
+    'search_venues': (
+        lambda pick: ('POST', '/venues/search', {'search_term': pick.term()}),
+        lambda pick: ('GET', '/api/v1/venues/search?q={}'.format(pick.term()), None),
+    ),
+    'show_venue': (
+        lambda pick: ('GET', '/venues/{}'.format(pick.venue()), None),
+        lambda pick: ('GET', '/api/v1/venues/{}'.format(pick.venue()), None),
+    ),
+    'show_artist': (
+        lambda pick: ('GET', '/artists/{}'.format(pick.artist()), None),
+        lambda pick: ('GET', '/api/v1/artists/{}'.format(pick.artist()), None),
+    ),
+    'create_venue': (
+        lambda pick: ('POST', '/venues/create', VENUE_FORM),
+        lambda pick: ('POST', '/api/v1/venues', json.dumps(VENUE_FORM)),
+    ),
+}
+
+
+def response_bytes(client, make_request, pick):
+    with client.application.app_context():
+        method, url, data = make_request(pick)
+    response = client.open(url, method=method, data=data)
+    size = len(response.get_data())
+    response.close()
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--pair', action='append', choices=sorted(PAIRS), help='run only this pair (repeatable)')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.extensions['response_cache'].enabled = False
+    client = app.test_client()
+
+    with app.app_context():
+        pick = Picker(args.seed)
+        scale = {
+            'venues': Venue.query.count(),
+            'artists': Artist.query.count(),
+            'shows': Show.query.count(),
+        }
+
+    results = {}
+    for name in args.pair or PAIRS:
+        result = {}
+        for side, make_request in zip(('html', 'api'), PAIRS[name]):
+            result[side] = run_scenario(client, make_request, pick, args.iterations, args.warmup)
+            result[side]['bytes'] = response_bytes(client, make_request, pick)
+        result['api_latency_ratio'] = round(result['api']['p50_ms'] / result['html']['p50_ms'], 3)
+        results[name] = result
+        print('{:<14} html p50 {:>8.2f} ms {:>8} B   api p50 {:>8.2f} ms {:>8} B   ratio {:.2f}'.format(
+            name, result['html']['p50_ms'], result['html']['bytes'],
+            result['api']['p50_ms'], result['api']['bytes'], result['api_latency_ratio']), file=sys.stderr)
+
+    report = {
+        'revision': git_revision(),
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'scale': scale,
+        'pairs': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""Fill the Venue/Artist/Show tables with deterministic, seeded data.
+
+    python -m benchmarks.generate --venues 10000 --artists 100000 --shows 10000000
+
+The same seed and anchor date always produce the same rows. Rows are
+streamed into PostgreSQL with COPY in chunks, so tens of millions of shows
+never sit in memory at once. Shows never overlap at a venue or for an
+artist, since show_booking rejects double bookings.
+"""
+import argparse
+import csv
+import io
+import random
+import sys
+from datetime import datetime, timedelta
+
+from app import create_app
+from forms import STATES
+from models import db, Artist, Venue, GENRES, SHOW_MINUTES
+import counters
+import directory
+import partitions
+
+WORDS = [
+    'Blue', 'Red', 'Golden', 'Silver', 'Electric', 'Velvet', 'Midnight', 'Neon',
+    'Crystal', 'Wild', 'Lucky', 'Broken', 'Little', 'Grand', 'Hollow', 'Iron',
+    'Echo', 'Lantern', 'Harbor', 'Canyon', 'Garden', 'Owl', 'Fox', 'Tiger',
+    'Room', 'Hall', 'Club', 'Lounge', 'Stage', 'Parlor', 'Tavern', 'House',
+]
+CITIES = [
+    'San Francisco', 'New York', 'Austin', 'Chicago', 'Seattle', 'Portland',
+    'Nashville', 'Denver', 'Atlanta', 'Boston', 'Detroit', 'Miami',
+    'New Orleans', 'Los Angeles', 'Minneapolis', 'Philadelphia',
+]
+
+
+def name(rng, words=2):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def array_literal(values):
+    # PostgreSQL array literal for COPY, e.g. {"Jazz","Rock n Roll"}
+    return '{' + ','.join('"{}"'.format(value) for value in values) + '}'
+
+
+def venue_rows(rng, count):
+    for id in range(1, count + 1):
+        yield (
+            id, '{} {}'.format(name(rng), id), array_literal(rng.sample(GENRES, rng.randint(1, 3))),
+            '{} {} St'.format(rng.randint(1, 9999), rng.choice(WORDS)),
+            rng.choice(CITIES), rng.choice(STATES), '555-{:03}-{:04}'.format(rng.randint(0, 999), rng.randint(0, 9999)),
+            'https://example.com/venues/{}'.format(id), rng.random() < 0.5, 'Looking for local acts',
+            'https://example.com/img/venue/{}.jpg'.format(id), 'https://www.facebook.com/venue{}'.format(id),
+        )
+
+
+def artist_rows(rng, count):
+    for id in range(1, count + 1):
+        yield (
+            id, '{} {}'.format(name(rng), id), rng.choice(CITIES), rng.choice(STATES),
+            '555-{:03}-{:04}'.format(rng.randint(0, 999), rng.randint(0, 9999)),
+            array_literal(rng.sample(GENRES, rng.randint(1, 3))),
+            'https://example.com/img/artist/{}.jpg'.format(id), 'https://www.facebook.com/artist{}'.format(id),
+            rng.random() < 0.5, 'Touring next season', 'https://example.com/artists/{}'.format(id),
+        )
+
+
+def show_rows(rng, count, venues, artists, anchor, history_days):
+    # history_days of history and one year of upcoming shows around the anchor,
+    # laid out in slots: every venue gets one show per slot, starting somewhere
+    # in the slot and ending before the next one, and the venues of a slot
+    # each get a different artist, so no venue or artist is double booked
+    span = int(timedelta(days=history_days + 365).total_seconds())
+    start = anchor - timedelta(days=history_days)
+    slots = max(-(-count // venues), 1)
+    spacing = span // slots // 1800 * 1800
+    if spacing < SHOW_MINUTES * 60 or venues > artists:
+        raise ValueError('{} shows do not fit {} venues and {} artists over {} days without overlaps'.format(
+            count, venues, artists, history_days + 365))
+    stride = rng.randrange(artists)
+    for slot in range(slots):
+        for venue in range(min(venues, count - slot * venues)):
+            offset = slot * spacing + rng.randrange(0, spacing - SHOW_MINUTES * 60 + 1, 1800)
+            start_time = start + timedelta(seconds=offset)
+            artist = (venue + slot * stride) % artists + 1
+            yield (artist, venue + 1, start_time.isoformat(sep=' '))
+
+
+def copy_rows(cursor, table, columns, rows, chunk_size):
+    copied = 0
+    while True:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        written = 0
+        for row in rows:
+            writer.writerow(row)
+            written += 1
+            if written == chunk_size:
+                break
+        if not written:
+            return copied
+        buffer.seek(0)
+        cursor.copy_expert('COPY "{}" ({}) FROM STDIN WITH CSV'.format(table, ', '.join(columns)), buffer)
+        copied += written
+        print('{}: {} rows'.format(table, copied), file=sys.stderr)
+
+
+def generate(venues, artists, shows, seed=42, anchor=None, chunk_size=100000, history_days=2 * 365):
+    rng = random.Random(seed)
+    anchor = anchor or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    # every generated month gets its own partition instead of show_default
+    partitions.ensure(partitions.months_between(anchor - timedelta(days=history_days), anchor + timedelta(days=365)))
+    db.session.commit()
+
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute('TRUNCATE show, show_booking, venue, artist RESTART IDENTITY CASCADE')
+        copy_rows(cursor, 'venue', [
+            'id', 'name', 'genres', 'address', 'city', 'state', 'phone', 'website',
+            'seeking_talent', 'seeking_description', 'image_link', 'facebook_link',
+        ], venue_rows(rng, venues), chunk_size)
+        copy_rows(cursor, 'artist', [
+            'id', 'name', 'city', 'state', 'phone', 'genres', 'image_link', 'facebook_link',
+            'seeking_venue', 'seeking_description', 'website',
+        ], artist_rows(rng, artists), chunk_size)
+        # the triggers on show fill show_booking as the rows arrive
+        copy_rows(cursor, 'show', ['artist_id', 'venue_id', 'start_time'],
+                  show_rows(rng, shows, venues, artists, anchor, history_days), chunk_size)
+
+        # explicit ids were copied, so move the sequences past them
+        for table in ('venue', 'artist'):
+            cursor.execute("SELECT setval(pg_get_serial_sequence('{0}', 'id'), GREATEST(MAX(id), 1)) FROM {0}".format(table))
+        connection.commit()
+    finally:
+        connection.close()
+
+    # COPY bypasses the write handlers, so count shows and build the /venues
+    # directory in one go
+    counters.recount(Venue)
+    counters.recount(Artist)
+    directory.refresh()
+    db.session.commit()
+
+    connection = db.engine.raw_connection()
+    try:
+        connection.autocommit = True
+        connection.cursor().execute('ANALYZE venue, artist, show, show_booking, venue_directory')
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--venues', type=int, default=10000)
+    parser.add_argument('--artists', type=int, default=100000)
+    parser.add_argument('--shows', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--anchor', type=datetime.fromisoformat,
+                        help='date the show timeline is centred on (default: today)')
+    parser.add_argument('--history-days', type=int, default=2 * 365,
+                        help='days of past shows before the anchor (default: two years)')
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        generate(args.venues, args.artists, args.shows, args.seed, args.anchor, args.chunk_size, args.history_days)
+
+
+if __name__ == '__main__':
+    main()
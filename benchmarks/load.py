@@ -0,0 +1,157 @@
+"""Load test the read API over HTTP with many concurrent connections.
+
+    CACHE_ENABLED=0 gunicorn -w 4 -b 127.0.0.1:8000 wsgi:app &
+    CACHE_ENABLED=0 uvicorn --workers 4 --port 8001 asgi:app &
+    python -m benchmarks.load --connections 1000 --duration 30 \\
+        --target wsgi=http://127.0.0.1:8000 --target asgi=http://127.0.0.1:8001
+
+Every connection loops over a mix of /api/v1 reads (listings, search,
+detail) with ids picked from DATABASE_URL, so both servers answer the same
+requests from the same database. A plain asyncio HTTP/1.1 client keeps the
+connections open while the server allows it and reconnects when it does
+not (gunicorn's sync workers close after every response). The report gives
+throughput, latency percentiles and errors (refused or reset connections,
+timeouts, non-2xx responses) per target.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from app import create_app
+from benchmarks.run import Picker, git_revision, percentile
+
+# name: request path for one pick, weighted by how often the mobile client asks
+MIX = [
+    ('venues', 2, lambda pick: '/api/v1/venues?limit=50&after={}'.format(pick.venue())),
+    ('artists', 2, lambda pick: '/api/v1/artists?limit=50&after={}'.format(pick.artist())),
+    ('shows', 2, lambda pick: '/api/v1/shows?limit=30&from={:%Y-%m-%d}'.format(datetime.now())),
+    ('search_venues', 1, lambda pick: '/api/v1/venues/search?q={}'.format(pick.term())),
+    ('show_venue', 4, lambda pick: '/api/v1/venues/{}'.format(pick.venue())),
+    ('show_artist', 4, lambda pick: '/api/v1/artists/{}'.format(pick.artist())),
+    ('venue_shows', 2, lambda pick: '/api/v1/shows?venue_id={}&from={:%Y-%m-%d}'.format(pick.venue(), datetime.now())),
+]
+
+
+def request_paths(pick, count):
+    # a fixed list of paths in mix proportions, shared by every target
+    weighted = [make_path for name, weight, make_path in MIX for _ in range(weight)]
+    return [pick.rng.choice(weighted)(pick) for _ in range(count)]
+
+
+async def read_response(reader):
+    # status, keep-alive; reads the body by Content-Length, or to EOF
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+        keep_alive = headers.get('connection', '').lower() != 'close'
+    else:
+        await reader.read()
+        keep_alive = False
+    return status, keep_alive
+
+
+async def connection(host, port, paths, offset, deadline, timeout, stats):
+    reader = writer = None
+    index = offset
+    while time.monotonic() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        started = time.monotonic()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+            writer.write('GET {} HTTP/1.1\r\nHost: {}\r\n\r\n'.format(path, host).encode('latin-1'))
+            status, keep_alive = await asyncio.wait_for(read_response(reader), timeout)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError):
+            stats['errors'] += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            # back off a little so a refusing server is not hammered in a tight loop
+            await asyncio.sleep(0.05)
+            continue
+
+        if 200 <= status < 300:
+            stats['latencies'].append((time.monotonic() - started) * 1000)
+        else:
+            stats['errors'] += 1
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def load(url, paths, connections, duration, timeout):
+    parts = urlsplit(url)
+    stats = {'latencies': [], 'errors': 0}
+    started = time.monotonic()
+    deadline = started + duration
+    step = max(len(paths) // connections, 1)
+    await asyncio.gather(*(
+        connection(parts.hostname, parts.port or 80, paths, number * step, deadline, timeout, stats)
+        for number in range(connections)))
+    elapsed = time.monotonic() - started
+
+    latencies = stats['latencies'] or [0]
+    return {
+        'requests': len(stats['latencies']),
+        'errors': stats['errors'],
+        'requests_per_second': round(len(stats['latencies']) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--target', action='append', required=True, metavar='NAME=URL',
+                        help='server to load, e.g. wsgi=http://127.0.0.1:8000 (repeatable)')
+    parser.add_argument('--connections', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=30, help='seconds per target')
+    parser.add_argument('--timeout', type=float, default=30, help='seconds before a request counts as failed')
+    parser.add_argument('--paths', type=int, default=20000, help='distinct requests to cycle through')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        paths = request_paths(Picker(args.seed), args.paths)
+
+    results = {}
+    for target in args.target:
+        name, url = target.split('=', 1)
+        results[name] = asyncio.run(load(url, paths, args.connections, args.duration, args.timeout))
+        print('{:<8} {requests_per_second:>9.1f} req/s  p50 {p50_ms:>9.2f} ms  p95 {p95_ms:>9.2f} ms  '
+              'p99 {p99_ms:>9.2f} ms  errors {errors}'.format(name, **results[name]), file=sys.stderr)
+
+    report = {
+        'revision': git_revision(),
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'connections': args.connections,
+        'duration_s': args.duration,
+        'targets': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Microbenchmarks for hot helpers, each compared with the code it replaced.
+
+    python -m benchmarks.micro --output micro.json
+
+datetime_filter: a page of 300 show times through the Jinja `datetime`
+filter, against dateutil + babel on every call (legacy). `cold` empties
+the filter's LRU cache before each pass, so only the precompiled babel
+patterns help; `current` is a page rendered again, served from the LRU.
+The search comparison is benchmarks/search.py.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from app import format_datetime, format_datetime_cached, DATETIME_FORMATS
+
+
+def timed(function, iterations):
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        function()
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return {
+        'iterations': iterations,
+        'p50_ms': round(latencies[len(latencies) // 2], 4),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1], 4),
+        'mean_ms': round(sum(latencies) / len(latencies), 4),
+    }
+
+
+def datetime_filter(iterations, rng):
+    # one page worth of show times, formatted the old way and the new way
+    dates = [datetime(2026, 1, 1) + timedelta(minutes=30 * rng.randint(0, 50000)) for _ in range(300)]
+
+    def legacy():
+        for date in dates:
+            babel.dates.format_datetime(dateutil.parser.parse(str(date)), DATETIME_FORMATS['full'], locale='en')
+
+    def cold():
+        format_datetime_cached.cache_clear()
+        current()
+
+    def current():
+        for date in dates:
+            format_datetime(date, 'full')
+
+    return {'legacy': timed(legacy, iterations), 'cold': timed(cold, iterations), 'current': timed(current, iterations)}
+
+
+BENCHMARKS = {
+    'datetime_filter': datetime_filter,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--benchmark', action='append', choices=sorted(BENCHMARKS))
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.benchmark or BENCHMARKS:
+        results[name] = BENCHMARKS[name](args.iterations, random.Random(args.seed))
+        print('{:<16} {}'.format(name, '  '.join(
+            '{} p50 {:>10.3f} ms'.format(variant, timings['p50_ms']) for variant, timings in results[name].items())),
+            file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
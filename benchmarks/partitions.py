@@ -0,0 +1,96 @@
+"""Show that upcoming-show pages stay flat as the show history grows.
+
+    python -m benchmarks.partitions --years 1 5 20 --shows-per-month 200000 --output partitions.json
+
+For each history length the database is regenerated with the same number of
+shows per month, so the upcoming year always holds the same rows while the
+table grows; 20 years at 200k shows a month is about 50M shows. Each step
+times the venue and artist pages and the upcoming /shows listing, and
+counts the show partitions the upcoming-show query reads (from EXPLAIN).
+This replaces the data in DATABASE_URL.
+"""
+import argparse
+import json
+import re
+import sys
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app import create_app
+from models import db, Show
+from benchmarks.generate import generate
+from benchmarks.run import Picker, git_revision, run_scenario
+
+SCENARIOS = {
+    'show_venue': lambda pick: ('GET', '/venues/{}'.format(pick.venue()), None),
+    'show_artist': lambda pick: ('GET', '/artists/{}'.format(pick.artist()), None),
+    'upcoming_shows': lambda pick: ('GET', '/shows?from={:%Y-%m-%d}'.format(datetime.now()), None),
+}
+
+# the query behind the upcoming half of the venue page
+UPCOMING_SHOWS = 'SELECT * FROM show WHERE venue_id = :venue_id AND start_time > :now ORDER BY start_time'
+
+
+def partitions_read(venue_id):
+    plan = db.session.execute(text('EXPLAIN ' + UPCOMING_SHOWS), {'venue_id': venue_id, 'now': datetime.now()})
+    # scan nodes name the partition and its alias ("on show_2024_01 show_3");
+    # bitmap index scans name only the index
+    return len(set(re.findall(r' on (show_\w+) show(?:_\d+)?\b', '\n'.join(line for line, in plan))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--years', type=int, nargs='+', default=[1, 5, 20], help='history lengths to measure')
+    parser.add_argument('--shows-per-month', type=int, default=200000)
+    parser.add_argument('--venues', type=int, default=10000)
+    parser.add_argument('--artists', type=int, default=100000)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    app = create_app()
+    app.extensions['response_cache'].enabled = False
+    client = app.test_client()
+
+    steps = []
+    for years in args.years:
+        # the history plus the upcoming year generate always adds
+        shows = args.shows_per_month * 12 * (years + 1)
+        with app.app_context():
+            generate(args.venues, args.artists, shows, args.seed, history_days=years * 365)
+            pick = Picker(args.seed)
+            step = {
+                'history_years': years,
+                'shows': Show.query.count(),
+                'partitions': db.session.execute(text(
+                    "SELECT count(*) FROM pg_inherits WHERE inhparent = 'show'::regclass")).scalar(),
+                'upcoming_partitions_read': partitions_read(pick.venue()),
+                'scenarios': {},
+            }
+            db.session.remove()
+
+        for name, make_request in SCENARIOS.items():
+            step['scenarios'][name] = run_scenario(client, make_request, pick, args.iterations, args.warmup)
+            print('{:>3} years {:>10} shows  {:<16} p50 {p50_ms:>8.2f} ms  p95 {p95_ms:>8.2f} ms'.format(
+                years, step['shows'], name, **step['scenarios'][name]), file=sys.stderr)
+        steps.append(step)
+
+    report = {
+        'revision': git_revision(),
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'shows_per_month': args.shows_per_month,
+        'steps': steps,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+"""Time every route in app.py with the Flask test client.
+
+    python -m benchmarks.run --iterations 50 --output bench.json
+
+Each scenario is warmed up, then timed; the report gives p50/p95/p99
+latency in milliseconds and the number of SQL statements per request as
+JSON, so runs on different commits can be diffed.
+"""
+import argparse
+import json
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func
+
+from app import create_app
+from models import db, Artist, Venue, Show, GENRES
+
+#----------------------------------------------------------------------------#
+# Scenarios.
+#----------------------------------------------------------------------------#
+
+# a scenario picks its arguments (untimed) and returns the request to time
+# as (method, url, form data).
+
+VENUE_FORM = {
+    'name': 'Benchmark Hall', 'city': 'San Francisco', 'state': 'CA',
+    'address': '1 Market St', 'phone': '555-000-0000', 'genres': ['Jazz', 'Folk'],
+    'image_link': 'https://example.com/venue.jpg', 'facebook_link': 'https://www.facebook.com/bench',
+    'website_link': 'https://example.com', 'seeking_description': '',
+}
+ARTIST_FORM = {
+    'name': 'Benchmark Band', 'city': 'San Francisco', 'state': 'CA',
+    'phone': '555-000-0000', 'genres': ['Jazz'], 'image_link': 'https://example.com/artist.jpg',
+    'facebook_link': 'https://www.facebook.com/bench', 'website_link': 'https://example.com',
+    'seeking_description': '',
+}
+# dates in a create_tour_submission, a typical tour
+TOUR_DATES = 40
+
+
+class Picker(object):
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.max_venue = db.session.query(func.max(Venue.id)).scalar() or 1
+        self.max_artist = db.session.query(func.max(Artist.id)).scalar() or 1
+
+    def venue(self):
+        return self.rng.randint(1, self.max_venue)
+
+    def artist(self):
+        return self.rng.randint(1, self.max_artist)
+
+    def tour(self, count):
+        # "venue_id, start_time" lines, one evening a day from a random day
+        first = datetime.now().replace(hour=20, minute=0, second=0, microsecond=0) + timedelta(days=self.rng.randint(1, 300))
+        return ['{}, {:%Y-%m-%d %H:%M:%S}'.format(self.venue(), first + timedelta(days=day)) for day in range(count)]
+
+    def window(self):
+        # a four hour window within the next year
+        start = datetime.now() + timedelta(hours=self.rng.randint(1, 365 * 24))
+        return start, start + timedelta(hours=4)
+
+    def term(self):
+        return self.rng.choice(['blue', 'hall', 'jazz', 'san', 'fox', 'neon'])
+
+    def genre(self):
+        return self.rng.choice(GENRES)
+
+
+def throwaway_venue():
+    venue = Venue(name='Benchmark Throwaway', city='Nowhere', state='CA')
+    db.session.add(venue)
+    db.session.commit()
+    id = venue.id
+    db.session.remove()
+    return id
+
+
+SCENARIOS = {
+    'index': lambda pick: ('GET', '/', None),
+    'venues': lambda pick: ('GET', '/venues', None),
+    'venues_by_genre': lambda pick: ('GET', '/venues?genre={}'.format(pick.genre()), None),
+    'search_venues': lambda pick: ('POST', '/venues/search', {'search_term': pick.term()}),
+    'show_venue': lambda pick: ('GET', '/venues/{}'.format(pick.venue()), None),
+    'venue_availability': lambda pick: ('GET', '/api/v1/venues/{}/availability?from={:%Y-%m-%dT%H:00}&to={:%Y-%m-%dT%H:00}'.format(
+        pick.venue(), *pick.window()), None),
+    'create_venue_form': lambda pick: ('GET', '/venues/create', None),
+    'create_venue_submission': lambda pick: ('POST', '/venues/create', VENUE_FORM),
+    'edit_venue': lambda pick: ('GET', '/venues/{}/edit'.format(pick.venue()), None),
+    'edit_venue_submission': lambda pick: ('POST', '/venues/{}/edit'.format(pick.venue()), VENUE_FORM),
+    'delete_venue': lambda pick: ('DELETE', '/venues/{}'.format(throwaway_venue()), None),
+    'artists': lambda pick: ('GET', '/artists', None),
+    'artists_by_genre': lambda pick: ('GET', '/artists?genre={}'.format(pick.genre()), None),
+    'search_artists': lambda pick: ('POST', '/artists/search', {'search_term': pick.term()}),
+    'show_artist': lambda pick: ('GET', '/artists/{}'.format(pick.artist()), None),
+    'edit_artist': lambda pick: ('GET', '/artists/{}/edit'.format(pick.artist()), None),
+    'edit_artist_submission': lambda pick: ('POST', '/artists/{}/edit'.format(pick.artist()), ARTIST_FORM),
+    'create_artist_form': lambda pick: ('GET', '/artists/create', None),
+    'create_artist_submission': lambda pick: ('POST', '/artists/create', ARTIST_FORM),
+    'shows': lambda pick: ('GET', '/shows', None),
+    'create_shows': lambda pick: ('GET', '/shows/create', None),
+    'create_show_submission': lambda pick: ('POST', '/shows/create', {
+        'artist_id': pick.artist(), 'venue_id': pick.venue(),
+        'start_time': (datetime.now() + timedelta(days=pick.rng.randint(1, 365))).strftime('%Y-%m-%d %H:%M:%S'),
+    }),
+    'create_tour_submission': lambda pick: ('POST', '/shows/tour', {
+        'artist_id': pick.artist(), 'dates': '\n'.join(pick.tour(TOUR_DATES)),
+    }),
+    'export_venues_csv': lambda pick: ('GET', '/export/venues.csv', None),
+    'export_shows_jsonl': lambda pick: ('GET', '/export/shows.jsonl', None),
+}
+
+# full-table scenarios are slow at scale, so they get fewer iterations
+SLOW_SCENARIOS = {'export_venues_csv', 'export_shows_jsonl'}
+
+#----------------------------------------------------------------------------#
+# Runner.
+#----------------------------------------------------------------------------#
+
+def percentile(values, percent):
+    # nearest-rank percentile
+    ordered = sorted(values)
+    rank = max(int(round(percent / 100.0 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(latencies, queries, statuses):
+    return {
+        'iterations': len(latencies),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'queries_p50': percentile(queries, 50),
+        'queries_max': max(queries),
+        'statuses': sorted(set(statuses)),
+    }
+
+
+def run_scenario(client, make_request, pick, iterations, warmup):
+    app = client.application
+    counter = {'queries': 0}
+
+    def count_query(*args):
+        counter['queries'] += 1
+
+    latencies, queries, statuses = [], [], []
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', count_query)
+    try:
+        for iteration in range(warmup + iterations):
+            with app.app_context():
+                method, url, data = make_request(pick)
+            counter['queries'] = 0
+            started = time.perf_counter()
+            response = client.open(url, method=method, data=data)
+            response.get_data()
+            elapsed = (time.perf_counter() - started) * 1000
+            response.close()
+            if iteration >= warmup:
+                latencies.append(elapsed)
+                queries.append(counter['queries'])
+                statuses.append(response.status_code)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count_query)
+    return summarize(latencies, queries, statuses)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='run only this scenario (repeatable)')
+    parser.add_argument('--cache', action='store_true', help='keep the response cache enabled')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.extensions['response_cache'].enabled = args.cache
+    client = app.test_client()
+
+    with app.app_context():
+        pick = Picker(args.seed)
+        scale = {
+            'venues': Venue.query.count(),
+            'artists': Artist.query.count(),
+            'shows': Show.query.count(),
+        }
+
+    results = {}
+    for name in args.scenario or SCENARIOS:
+        iterations = min(args.iterations, 3) if name in SLOW_SCENARIOS else args.iterations
+        warmup = 0 if name in SLOW_SCENARIOS else args.warmup
+        results[name] = run_scenario(client, SCENARIOS[name], pick, iterations, warmup)
+        print('{:<26} p50 {p50_ms:>9.2f} ms  p95 {p95_ms:>9.2f} ms  p99 {p99_ms:>9.2f} ms  queries {queries_p50}'.format(
+            name, **results[name]), file=sys.stderr)
+
+    report = {
+        'revision': git_revision(),
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'cache': args.cache,
+        'scale': scale,
+        'scenarios': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Compare the ranked, index-backed search with the ILIKE scan it replaced.
+
+    python -m benchmarks.generate --venues 500000 --artists 500000 --shows 1000000
+    python -m benchmarks.search --iterations 20 --output search.json
+
+legacy: the old search_venues/search_artists, a name ILIKE '%term%' over
+the whole table (run with bitmap scans off, so the trigram indexes are not
+used, as before they existed) and, for venues, one lazy `venue.shows` load
+per hit. current: search.venues/search.artists, ranked over name, city and
+genre through the GIN indexes, with the counts read from the counters.
+Both sides search the same terms. The run is refused on fewer than
+--min-rows venues and artists together, 1M by default.
+"""
+import argparse
+import json
+import sys
+
+from sqlalchemy import func, text
+
+import search
+from app import create_app
+from benchmarks.micro import timed
+from benchmarks.run import Picker
+from models import db, Artist, Venue
+
+
+def legacy_venues(term):
+    venues = Venue.query.filter(Venue.name.ilike('%{}%'.format(term))).all()
+    return [{'id': venue.id, 'name': venue.name, 'num_upcoming_shows': len(venue.shows)} for venue in venues]
+
+
+def legacy_artists(term):
+    return Artist.query.filter(Artist.name.ilike('%{}%'.format(term))).all()
+
+
+KINDS = {
+    'venues': (legacy_venues, search.venues),
+    'artists': (legacy_artists, search.artists),
+}
+
+
+def compare(kind, iterations, seed):
+    legacy_search, current_search = KINDS[kind]
+    # one picker per side, so both search the same terms in the same order
+    legacy_pick, current_pick = Picker(seed), Picker(seed)
+
+    def legacy():
+        # GIN indexes only serve bitmap scans: with those off the ILIKE
+        # reads the whole table, like it did before the trigram indexes
+        db.session.execute(text('SET LOCAL enable_bitmapscan = off'))
+        legacy_search(legacy_pick.term())
+        db.session.rollback()
+
+    def current():
+        current_search(current_pick.term())
+        db.session.rollback()
+
+    return {'legacy': timed(legacy, iterations), 'current': timed(current, iterations)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--min-rows', type=int, default=1000000,
+                        help='venues and artists the dataset must hold together')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        rows = db.session.query(func.count(Venue.id)).scalar() + db.session.query(func.count(Artist.id)).scalar()
+        if rows < args.min_rows:
+            sys.exit('{} venues and artists, fewer than --min-rows {}; run benchmarks.generate first'.format(
+                rows, args.min_rows))
+
+        results = {'rows': rows}
+        for kind in KINDS:
+            results[kind] = compare(kind, args.iterations, args.seed)
+            legacy, current = results[kind]['legacy'], results[kind]['current']
+            print('{:<8} legacy p50 {:>10.3f} ms  current p50 {:>10.3f} ms'.format(
+                kind, legacy['p50_ms'], current['p50_ms']), file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Measure how long a worker and the flask command take to start.
+
+    python -m benchmarks.startup --runs 10 --output startup.json
+    python -m benchmarks.startup --baseline startup.json
+
+Each target runs in a fresh interpreter. `import_ms` comes from
+`python -X importtime` and `wall_ms` is the time from process start to
+exit. `slowest_imports` lists the top-level packages that cost the most,
+counting their own imports. With --baseline the run exits non-zero when a target's
+p50 wall time regresses by more than --tolerance, so CI can track it.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.run import git_revision, percentile
+
+# what a gunicorn worker (without preload) and a CLI command do before serving
+TARGETS = {
+    'worker': [sys.executable, '-c', 'import wsgi'],
+    'cli': [sys.executable, '-m', 'flask', '--help'],
+}
+ENTRY_POINTS = {'wsgi', 'app', 'encodings', 'site'}
+
+
+def import_times(stderr):
+    # lines look like "import time:  self [us] | cumulative | indented package"
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((int(cumulative_us), depth, name.strip()))
+    return modules
+
+
+def measure(command, runs, top):
+    env = dict(os.environ, FLASK_APP='app')
+    walls = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        walls.append((time.perf_counter() - started) * 1000)
+
+    # one more run for the import profile; importtime itself slows imports down
+    result = subprocess.run(command[:1] + ['-X', 'importtime'] + command[1:], env=env, check=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    modules = import_times(result.stderr)
+    packages = sorted((module for module in modules if '.' not in module[2] and module[2] not in ENTRY_POINTS), reverse=True)
+
+    return {
+        'runs': runs,
+        'wall_p50_ms': round(percentile(walls, 50), 3),
+        'wall_min_ms': round(min(walls), 3),
+        'import_ms': round(sum(cumulative for cumulative, depth, name in modules if depth == 1) / 1000, 3),
+        'modules': len(modules),
+        'slowest_imports': [
+            {'module': name, 'ms': round(cumulative / 1000, 3)}
+            for cumulative, depth, name in packages[:top]
+        ],
+    }
+
+
+def regressions(results, baseline, tolerance):
+    failed = []
+    for name, result in results.items():
+        before = baseline.get('targets', {}).get(name)
+        if before and result['wall_p50_ms'] > before['wall_p50_ms'] * (1 + tolerance):
+            failed.append('{}: p50 {:.1f} ms, baseline {:.1f} ms'.format(
+                name, result['wall_p50_ms'], before['wall_p50_ms']))
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=10, help='number of slowest imports to report')
+    parser.add_argument('--target', action='append', choices=sorted(TARGETS))
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--baseline', help='JSON report of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed p50 wall time regression against --baseline (default: 0.2)')
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.target or TARGETS:
+        results[name] = measure(TARGETS[name], args.runs, args.top)
+        print('{:<8} wall p50 {wall_p50_ms:>8.1f} ms  imports {import_ms:>8.1f} ms  modules {modules}'.format(
+            name, **results[name]), file=sys.stderr)
+
+    report = {
+        'revision': git_revision(),
+        'python': sys.version.split()[0],
+        'targets': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            failed = regressions(results, json.load(file), args.tolerance)
+        for line in failed:
+            print('startup regression: ' + line, file=sys.stderr)
+        if failed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
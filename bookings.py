@@ -0,0 +1,98 @@
+from bisect import bisect, insort
+from datetime import timedelta
+from sqlalchemy import and_, cast, column, func, literal, select, text, union_all, values, DateTime, Integer
+from sqlalchemy.exc import IntegrityError
+from models import db, ShowBooking
+
+#----------------------------------------------------------------------------#
+# Show bookings.
+#----------------------------------------------------------------------------#
+
+# show_booking mirrors show through triggers (see ShowBooking): a show that
+# overlaps another at the same venue, or by the same artist, fails its
+# INSERT with an exclusion violation, whichever path wrote it, and "is this
+# venue free" is one probe of the GiST index behind the constraint.
+
+CONSTRAINTS = {
+    'show_booking_venue_excl': 'venue',
+    'show_booking_artist_excl': 'artist',
+}
+
+
+def conflict(error):
+    # 'venue' or 'artist' when error is a double booking rejected by
+    # show_booking, None for any other error
+    if not isinstance(error, IntegrityError):
+        return None
+    diag = getattr(error.orig, 'diag', None)
+    return CONSTRAINTS.get(getattr(diag, 'constraint_name', None))
+
+
+def end_time(values):
+    return values['start_time'] + timedelta(minutes=values['duration_minutes'])
+
+
+def booked(rows):
+    # {index: (side, show id)} for the rows (show values: venue_id, artist_id,
+    # start_time, duration_minutes, id when updating) that overlap a booked
+    # show. One query: the rows go in as VALUES and each probes the GiST
+    # index once for its venue and once for its artist
+    if not rows:
+        return {}
+    requested = select(values(
+        column('n', Integer), column('id', Integer), column('venue_id', Integer), column('artist_id', Integer),
+        column('start_time', DateTime), column('end_time', DateTime), name='rows',
+    ).data([(n, row.get('id'), row['venue_id'], row['artist_id'], row['start_time'], end_time(row))
+            for n, row in enumerate(rows)])).cte('requested')
+    during = func.tsrange(requested.c.start_time, requested.c.end_time)
+    probes = [
+        select(requested.c.n, literal(side), ShowBooking.show_id).select_from(requested).join(ShowBooking, and_(
+            key == requested.c[side + '_id'], ShowBooking.during.overlaps(during),
+            # a show being updated does not conflict with its own booking
+            ShowBooking.show_id.is_distinct_from(cast(requested.c.id, Integer))))
+        for side, key in (('venue', ShowBooking.venue_id), ('artist', ShowBooking.artist_id))
+    ]
+    found = {}
+    for n, side, show_id in db.session.execute(union_all(*probes)):
+        found.setdefault(n, (side, show_id))
+    return found
+
+
+def overlapping(rows, skip=()):
+    # {index: (side, earlier index)} for the rows that overlap an earlier row
+    # at the same venue or by the same artist; rows in skip are not listed
+    # and block nothing. The ranges held by a venue or artist never overlap
+    # each other, so a new one only needs comparing with its neighbours
+    held = {}
+    found = {}
+    for n, row in enumerate(rows):
+        if n in skip:
+            continue
+        start, end = row['start_time'], end_time(row)
+        for side in ('venue', 'artist'):
+            ranges = held.get((side, row[side + '_id']), [])
+            at = bisect(ranges, (start,))
+            clash = [other for other_start, other_end, other in ranges[max(at - 1, 0):at + 1]
+                     if other_start < end and start < other_end]
+            if clash:
+                found[n] = (side, clash[0])
+                break
+        else:
+            for side in ('venue', 'artist'):
+                insort(held.setdefault((side, row[side + '_id']), []), (start, end, n))
+    return found
+
+
+def rebook(table):
+    # bookings for rows that reached show without passing its triggers:
+    # a new partition is filled with rows moved out of show_default (whose
+    # DELETE dropped their bookings) before it is attached
+    db.session.execute(text(
+        'INSERT INTO show_booking (show_id, venue_id, artist_id, during) '
+        "SELECT id, venue_id, artist_id, tsrange(start_time, start_time + duration_minutes * interval '1 minute') "
+        'FROM {}'.format(table)))
+
+
+def unbook(table):
+    # a detached partition leaves show without firing its triggers
+    db.session.execute(text('DELETE FROM show_booking WHERE show_id IN (SELECT id FROM {})'.format(table)))
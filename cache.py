@@ -0,0 +1,268 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import timezone
+from functools import wraps
+from urllib.parse import urlencode
+from flask import Response, g, make_response, request, session
+from flask.signals import Namespace
+
+# sent on every lookup with hit=True/False, for exporters such as metrics
+cache_lookup = Namespace().signal('cache-lookup')
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+# a backend only needs get/set/delete, so a shared store (redis, memcached)
+# can be dropped in by wrapping its client in a class with the same methods.
+
+class LRUCache(object):
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + ttl if ttl else None
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+#----------------------------------------------------------------------------#
+# Response and fragment cache.
+#----------------------------------------------------------------------------#
+
+# every entry is stored with the current version of each of its tags
+# (e.g. 'venues', 'venue:3'); invalidating a tag gives it a new version,
+# so every entry that depends on it misses from then on. A version starts
+# with the time it was made, so a read can tell how recent it is.
+
+class ResponseCache(object):
+
+    def __init__(self, app=None, backend=None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.counter_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, backend)
+
+    def init_app(self, app, backend=None):
+        app.config.setdefault('CACHE_ENABLED', True)
+        app.config.setdefault('CACHE_DEFAULT_TTL', 60)
+        app.config.setdefault('CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('REPLICA_READ_YOUR_WRITES_SECONDS', 5)
+
+        self.enabled = app.config['CACHE_ENABLED']
+        self.default_ttl = app.config['CACHE_DEFAULT_TTL']
+        self.replica_lag = app.config['REPLICA_READ_YOUR_WRITES_SECONDS']
+        self.backend = backend or self.backend or LRUCache(app.config['CACHE_MAX_ENTRIES'])
+        app.extensions['response_cache'] = self
+
+    def tag_version(self, tag):
+        key = 'tag:' + tag
+        version = self.backend.get(key)
+        if version is None:
+            # a tag that was never set (or was evicted) gets a fresh version,
+            # so entries stored against an older one can never match again
+            version = self.new_version()
+            self.backend.set(key, version)
+        return version
+
+    def new_version(self):
+        return '{:.6f}:{}'.format(time.time(), uuid.uuid4().hex)
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.backend.set('tag:' + tag, self.new_version())
+
+    def tag(self, *tags):
+        # add tags to whatever is being cached in the current request
+        if 'cache_tags' in g:
+            g.cache_tags.update(tags)
+
+    def lookup(self, key):
+        entry = self.backend.get(key)
+        if entry is not None:
+            versions, value = entry
+            if all(self.tag_version(tag) == version for tag, version in versions.items()):
+                self.count(hit=True)
+                return value
+        self.count(hit=False)
+        return None
+
+    def store(self, key, value, tags, ttl=None):
+        self.store_read(key, value, tags, ttl, from_replica=g.get('db_replica') is not None)
+
+    def store_read(self, key, value, tags, ttl, from_replica):
+        versions = {tag: self.tag_version(tag) for tag in tags}
+        # a replica may not have replayed the write behind a fresh version
+        # yet: stored under it, its stale read would be served until the next
+        # invalidation. Leave the entry to a read made after replicas catch up
+        if from_replica:
+            recent = time.time() - self.replica_lag
+            if any(float(version.split(':', 1)[0]) > recent for version in versions.values()):
+                return
+        self.backend.set(key, (versions, value), ttl or self.default_ttl)
+
+    def get_or_set(self, key, creator, tags=(), ttl=None):
+        # fragment cache: return the cached value or build, tag and store it
+        if not self.enabled:
+            return creator()
+
+        value = self.lookup('fragment:' + key)
+        if value is None:
+            outer_tags = g.get('cache_tags')
+            g.cache_tags = set(tags)
+            try:
+                value = creator()
+                self.store('fragment:' + key, value, g.cache_tags, ttl)
+            finally:
+                if outer_tags is not None:
+                    outer_tags.update(g.cache_tags)
+                    g.cache_tags = outer_tags
+                else:
+                    g.pop('cache_tags')
+        return value
+
+    def cached(self, *tags, ttl=None):
+        # response cache for GET views, keyed by path and sorted query string;
+        # tags may reference view arguments, e.g. 'venue:{venue_id}'
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                # pages carrying flashed messages are personal, never share them
+                if not self.enabled or request.method != 'GET' or '_flashes' in session:
+                    return view(*args, **kwargs)
+
+                key = 'view:{}?{}'.format(request.path, urlencode(sorted(request.args.items(multi=True))))
+
+                cached_response = self.lookup(key)
+                if cached_response is not None:
+                    body, status, headers = cached_response
+                    response = Response(body, status=status, headers=headers)
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                g.cache_tags = set(tag.format(**kwargs) for tag in tags)
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and '_flashes' not in session:
+                    headers = [(name, value) for name, value in response.headers if name != 'Content-Length']
+                    if response.is_streamed:
+                        # reading the body here would hold back the first
+                        # chunk until the last one is rendered
+                        response.response = self.tee(key, response.response, headers, g.cache_tags, ttl)
+                    else:
+                        self.store(key, (response.get_data(), response.status_code, headers), g.cache_tags, ttl)
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+    def tee(self, key, chunks, headers, tags, ttl):
+        # pass a streamed body through, storing it once the last chunk has
+        # gone out; a stream that fails or is dropped halfway is not stored.
+        # The request context may be gone by then, so what store() would
+        # read from g is taken now
+        from_replica = g.get('db_replica') is not None
+
+        def generate():
+            body = []
+            for chunk in chunks:
+                body.append(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+                yield chunk
+            self.store_read(key, (b''.join(body), 200, headers), tags, ttl, from_replica)
+
+        return generate()
+
+    def count(self, hit):
+        with self.counter_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        cache_lookup.send(self, hit=hit)
+
+    def stats(self):
+        with self.counter_lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / total if total else 0.0,
+        }
+
+#----------------------------------------------------------------------------#
+# Conditional requests.
+#----------------------------------------------------------------------------#
+
+def changed_at(written, started):
+    # when a page last changed: its last write, or the start of its latest
+    # started show, which moves from upcoming to past without a write.
+    # written is UTC like updated_at, started a naive local show time
+    if started is None:
+        return written
+    return max(written, started.astimezone(timezone.utc).replace(tzinfo=None))
+
+
+def conditional(state):
+    # answer If-None-Match/If-Modified-Since with a 304 before the view runs;
+    # state(**view_args) returns a row whose first column is the page's
+    # last-modified time (UTC), or None when the page does not exist
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # a 304 would hide pending flashed messages
+            if request.method != 'GET' or '_flashes' in session:
+                return view(*args, **kwargs)
+
+            current = state(**kwargs)
+            if current is None:
+                return view(*args, **kwargs)
+
+            last_modified = current[0].replace(tzinfo=timezone.utc, microsecond=0)
+            etag = hashlib.sha1(repr(tuple(current)).encode()).hexdigest()
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            elif request.if_modified_since:
+                not_modified = last_modified <= request.if_modified_since
+            else:
+                not_modified = False
+
+            if not_modified:
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+
+cache = ResponseCache()
@@ -0,0 +1,117 @@
+from datetime import datetime
+import click
+from flask.cli import AppGroup
+from sqlalchemy import case, func, select, tuple_, update
+from models import db, Artist, Venue, Show
+from cache import cache
+import directory
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+# venues and artists carry upcoming_shows_count, past_shows_count and
+# next_show_at, so no page counts shows. A new show bumps its venue's and
+# artist's counters in the writer's transaction (add_show). A show moves
+# from upcoming to past when it starts, which `flask counters roll` picks up
+# through next_show_at; it should run every minute or so. `flask counters
+# reconcile` recounts everything and repairs any drift.
+
+SHOW_KEYS = {Venue: Show.venue_id, Artist: Show.artist_id}
+
+
+def add_show(show, now=None):
+    # one UPDATE ... FROM show per side; the start time is read from the
+    # flushed row, the handler may have set it from the form's string
+    now = now or datetime.now()
+    db.session.flush()
+    upcoming = Show.start_time > now
+    for model, key in SHOW_KEYS.items():
+        db.session.execute(
+            update(model)
+            .where(model.id == key, Show.id == show.id)
+            .values(
+                upcoming_shows_count=model.upcoming_shows_count + case((upcoming, 1), else_=0),
+                past_shows_count=model.past_shows_count + case((upcoming, 0), else_=1),
+                next_show_at=func.least(model.next_show_at, case((upcoming, Show.start_time))))
+            .execution_options(synchronize_session=False))
+
+
+def recount(model, *criteria, now=None):
+    # recount the venues or artists matching criteria (all of them when none
+    # are given) from show; only rows whose counters changed are written,
+    # and their ids are returned
+    now = now or datetime.now()
+    upcoming = Show.start_time > now
+    counts = select(
+        model.id,
+        func.count(Show.id).filter(upcoming).label('upcoming'),
+        func.count(Show.id).filter(~upcoming).label('past'),
+        func.min(Show.start_time).filter(upcoming).label('next_show_at')
+    ).outerjoin(Show, SHOW_KEYS[model] == model.id) \
+        .where(*criteria) \
+        .group_by(model.id) \
+        .subquery()
+
+    counters = (model.upcoming_shows_count, model.past_shows_count, model.next_show_at)
+    statement = update(model) \
+        .where(model.id == counts.c.id) \
+        .where(tuple_(*counters).is_distinct_from(tuple_(counts.c.upcoming, counts.c.past, counts.c.next_show_at))) \
+        .values(upcoming_shows_count=counts.c.upcoming, past_shows_count=counts.c.past, next_show_at=counts.c.next_show_at) \
+        .returning(model.id) \
+        .execution_options(synchronize_session=False)
+
+    db.session.flush()
+    return [id for id, in db.session.execute(statement)]
+
+
+def recount_shows(batch):
+    # after shows were written in bulk: recount their venues and artists
+    venue_ids = recount(Venue, Venue.id.in_(set(values['venue_id'] for values in batch)))
+    recount(Artist, Artist.id.in_(set(values['artist_id'] for values in batch)))
+    return venue_ids
+
+
+def roll(now=None):
+    # venues and artists whose next upcoming show has started since they
+    # were last counted; returns the ids of the venues that changed
+    now = now or datetime.now()
+    venue_ids = recount(Venue, Venue.next_show_at <= now, now=now)
+    artist_ids = recount(Artist, Artist.next_show_at <= now, now=now)
+    return venue_ids, artist_ids
+
+
+def invalidate(venue_ids, artist_ids):
+    # the listings show venue counts; the detail pages show both
+    tags = ['venue:{}'.format(id) for id in venue_ids] + ['artist:{}'.format(id) for id in artist_ids]
+    if venue_ids:
+        tags.append('venues')
+    cache.invalidate(*tags)
+
+
+counters_command = AppGroup('counters', help='Maintain the show counters of venues and artists.')
+
+
+@counters_command.command('roll')
+def roll_command():
+    """Move started shows from upcoming to past."""
+    venue_ids, artist_ids = roll()
+    if venue_ids:
+        directory.refresh_venues(venue_ids)
+    db.session.commit()
+    invalidate(venue_ids, artist_ids)
+    click.echo('Rolled {} venues and {} artists.'.format(len(venue_ids), len(artist_ids)))
+
+
+@counters_command.command('reconcile')
+def reconcile_command():
+    """Recount every venue and artist and rebuild the venue directory."""
+    venue_ids = recount(Venue)
+    artist_ids = recount(Artist)
+    refreshed = directory.refresh()
+    db.session.commit()
+    invalidate(venue_ids, artist_ids)
+    if refreshed:
+        cache.invalidate('venues')
+    click.echo('Repaired {} venues and {} artists, {} directory rows.'.format(
+        len(venue_ids), len(artist_ids), refreshed))
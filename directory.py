@@ -0,0 +1,43 @@
+from sqlalchemy import func, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from models import db, Venue, VenueDirectory
+
+#----------------------------------------------------------------------------#
+# Venue directory.
+#----------------------------------------------------------------------------#
+
+# /venues reads venue_directory, one precomputed row per venue with its
+# upcoming show count, instead of reading venues in area order and counting
+# their shows. The count is copied from the venue's counters (counters.py).
+# Writers refresh the rows they touch in their own transaction: the venue
+# and show handlers, the importer, and `flask counters roll`, which moves
+# started shows to the past.
+
+COLUMNS = ['venue_id', 'name', 'city', 'state', 'genres', 'num_upcoming_shows']
+
+
+def refresh(*criteria):
+    # copy the venues matching criteria (every venue when none are given)
+    # with one INSERT ... SELECT ... ON CONFLICT DO UPDATE. A missing name,
+    # city or state is copied as '', which the listing's keyset can compare
+    rows = select(
+        Venue.id, func.coalesce(Venue.name, ''), func.coalesce(Venue.city, ''), func.coalesce(Venue.state, ''),
+        Venue.genres, Venue.upcoming_shows_count
+    ).where(*criteria)
+
+    # rows that come out the same are left alone, so a full rebuild does not
+    # rewrite (and bloat) the whole table
+    statement = insert(VenueDirectory).from_select(COLUMNS, rows)
+    table = VenueDirectory.__table__
+    statement = statement.on_conflict_do_update(
+        index_elements=['venue_id'],
+        set_={column: statement.excluded[column] for column in COLUMNS[1:]},
+        where=or_(*(table.c[column].is_distinct_from(statement.excluded[column]) for column in COLUMNS[1:])))
+
+    # pending changes to venues must be visible to the SELECT
+    db.session.flush()
+    return db.session.execute(statement).rowcount
+
+
+def refresh_venues(venue_ids):
+    return refresh(Venue.id.in_(list(venue_ids)))
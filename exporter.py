@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+from datetime import datetime
+from models import db, Artist, Venue, Show
+
+#----------------------------------------------------------------------------#
+# Export.
+#----------------------------------------------------------------------------#
+
+# rows are read as plain column tuples through a server-side cursor
+# (yield_per turns on stream_results), so memory stays flat no matter how
+# large the tables are and no ORM object or lazy relationship is touched.
+
+def export_query(kind):
+    if kind == 'venues':
+        return db.session.query(*Venue.__table__.columns).order_by(Venue.id)
+    if kind == 'artists':
+        return db.session.query(*Artist.__table__.columns).order_by(Artist.id)
+    # show rows carry the artist and venue names from the same statement
+    return db.session.query(
+            Show.id, Show.start_time, Show.duration_minutes,
+            Show.artist_id, Artist.name.label('artist_name'),
+            Show.venue_id, Venue.name.label('venue_name')
+        ).join(Artist, Show.artist_id == Artist.id) \
+        .join(Venue, Show.venue_id == Venue.id) \
+        .order_by(Show.id)
+
+
+def to_json(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError('{!r} is not JSON serializable'.format(value))
+
+
+def csv_value(value):
+    if isinstance(value, list):
+        return ','.join(str(item) for item in value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def export_rows(kind, format, batch_size=1000):
+    # yields the export as text chunks of about batch_size rows each
+    query = export_query(kind).yield_per(batch_size)
+    names = [column['name'] for column in query.column_descriptions]
+    buffer = io.StringIO()
+
+    if format == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(names)
+        write = lambda row: writer.writerow([csv_value(value) for value in row])
+    else:
+        write = lambda row: buffer.write(json.dumps(dict(zip(names, row)), default=to_json) + '\n')
+
+    for count, row in enumerate(query, start=1):
+        write(row)
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
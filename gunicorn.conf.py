@@ -0,0 +1,20 @@
+# gunicorn settings for running Fyyur with several worker processes:
+#
+#   PROMETHEUS_MULTIPROC_DIR=/tmp/fyyur-metrics gunicorn wsgi:app
+#
+# every worker writes its metric samples to PROMETHEUS_MULTIPROC_DIR and
+# /metrics aggregates them; the directory must exist and be emptied
+# between deployments.
+from prometheus_client import multiprocess
+
+wsgi_app = 'wsgi:app'
+
+# build the app once in the master and fork workers from it, so a new
+# worker is ready as soon as it is forked; no database connection is
+# opened before the fork
+preload_app = True
+
+
+def child_exit(server, worker):
+    # drop the live gauges (in-flight requests) of workers that have exited
+    multiprocess.mark_process_dead(worker.pid)
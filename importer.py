@@ -0,0 +1,367 @@
+import csv
+import json
+import time
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import column, func, literal, or_, select, text, union_all, update, values
+from sqlalchemy.dialects.postgresql import insert
+from wtforms.fields.core import UnboundField
+from wtforms.validators import DataRequired, URL
+from forms import ArtistForm, ShowForm, VenueForm
+from models import db, Artist, Venue, Show, SHOW_MINUTES
+from cache import cache
+import bookings
+import counters
+import directory
+
+#----------------------------------------------------------------------------#
+# Validation.
+#----------------------------------------------------------------------------#
+
+# the rules are read once from the form classes (required fields, choices,
+# URL checks, datetime format) and applied to plain dicts, so importing a
+# row never builds a WTForms object.
+
+class RowError(ValueError):
+    pass
+
+
+def form_rules(form_class):
+    rules = {}
+    for name, field in vars(form_class).items():
+        if not isinstance(field, UnboundField):
+            continue
+        validators = field.kwargs.get('validators') or []
+        choices = field.kwargs.get('choices')
+        rules[name] = {
+            'type': field.field_class.__name__,
+            'required': any(isinstance(v, DataRequired) for v in validators),
+            'urls': [v for v in validators if isinstance(v, URL)],
+            'choices': set(value for value, label in choices) if choices else None,
+            'format': field.kwargs.get('format', '%Y-%m-%d %H:%M:%S'),
+        }
+    return rules
+
+
+def to_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('true', 't', 'yes', 'y', '1')
+
+
+def to_list(value):
+    if isinstance(value, list):
+        return value
+    return [item.strip() for item in str(value).split(',') if item.strip()]
+
+
+# a JSON row (the API, .jsonl files) can hold any type; besides null and the
+# strings a CSV has, a field takes only what its conversion below does, and
+# the venue and artist of a show may be given as numbers
+JSON_TYPES = {
+    'SelectMultipleField': (str, list),
+    'BooleanField': (str, bool),
+    'IntegerField': (str, int),
+}
+REFERENCES = ('venue_id', 'artist_id')
+TYPE_NAMES = {str: 'string', list: 'list of strings', bool: 'boolean', int: 'integer'}
+
+
+def of_type(value, allowed):
+    if value is None:
+        return True
+    if isinstance(value, bool):
+        return bool in allowed
+    if isinstance(value, list):
+        return list in allowed and all(isinstance(item, str) for item in value)
+    return isinstance(value, allowed)
+
+
+def type_errors(row, rules):
+    errors = []
+    for name, rule in rules.items():
+        allowed = (str, int) if name in REFERENCES else JSON_TYPES.get(rule['type'], (str,))
+        if not of_type(row.get(name), allowed):
+            errors.append('{}: expected a {}'.format(name, ' or '.join(TYPE_NAMES[kind] for kind in allowed)))
+    return errors
+
+
+def clean_row(row, rules):
+    # every field of the wrong type is reported, before any is cleaned
+    errors = type_errors(row, rules)
+    if errors:
+        raise RowError('; '.join(errors))
+    cleaned = {}
+    for name, rule in rules.items():
+        value = row.get(name)
+        if isinstance(value, str):
+            value = value.strip()
+
+        if rule['type'] == 'SelectMultipleField':
+            value = to_list(value) if value not in (None, '') else []
+        elif rule['type'] == 'BooleanField':
+            value = to_bool(value) if value not in (None, '') else False
+        elif rule['type'] == 'DateTimeField' and value and not isinstance(value, datetime):
+            try:
+                value = datetime.strptime(value, rule['format'])
+            except ValueError:
+                raise RowError('{}: not a valid datetime'.format(name))
+
+        if rule['required'] and not value:
+            raise RowError('{}: this field is required'.format(name))
+        for validator in rule['urls']:
+            if not validator.regex.match(value or ''):
+                raise RowError('{}: invalid URL'.format(name))
+        if rule['choices'] is not None and value:
+            values = value if isinstance(value, list) else [value]
+            invalid = [v for v in values if v not in rule['choices']]
+            if invalid:
+                raise RowError('{}: not a valid choice: {}'.format(name, ', '.join(invalid)))
+
+        cleaned[name] = value
+    return cleaned
+
+#----------------------------------------------------------------------------#
+# Row mapping.
+#----------------------------------------------------------------------------#
+
+def optional_id(row):
+    if row.get('id') in (None, ''):
+        return None
+    try:
+        return int(row['id'])
+    except (TypeError, ValueError):
+        raise RowError('id: not a valid integer')
+
+
+def venue_values(row, rules):
+    values = clean_row(row, rules)
+    values['website'] = values.pop('website_link') or row.get('website')
+    values['id'] = optional_id(row)
+    return values
+
+
+def artist_values(row, rules):
+    values = clean_row(row, rules)
+    values['website'] = values.pop('website_link') or row.get('website')
+    values['id'] = optional_id(row)
+    return values
+
+
+def show_values(row, rules):
+    values = clean_row(row, rules)
+    try:
+        values['artist_id'] = int(values['artist_id'])
+        values['venue_id'] = int(values['venue_id'])
+    except (TypeError, ValueError):
+        raise RowError('artist_id/venue_id: not a valid integer')
+    try:
+        values['duration_minutes'] = int(values['duration_minutes'] or SHOW_MINUTES)
+    except (TypeError, ValueError):
+        raise RowError('duration_minutes: not a valid integer')
+    if not 0 < values['duration_minutes'] <= 24 * 60:
+        raise RowError('duration_minutes: must be between 1 and 1440')
+    values['id'] = optional_id(row)
+    return values
+
+
+IMPORTERS = {
+    'venues': (Venue, VenueForm, venue_values),
+    'artists': (Artist, ArtistForm, artist_values),
+    'shows': (Show, ShowForm, show_values),
+}
+
+#----------------------------------------------------------------------------#
+# Reading and writing.
+#----------------------------------------------------------------------------#
+
+def read_rows(file, format):
+    # yields (line number, dict) without reading the whole file
+    if format == 'csv':
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_num, line in enumerate(file, start=1):
+            if line.strip():
+                try:
+                    yield line_num, json.loads(line)
+                except ValueError:
+                    yield line_num, None
+
+
+def known_references(batch):
+    # shows must point at existing venues and artists, checked with one query:
+    # an IN list for each table, combined with UNION ALL
+    venue_ids = set(values['venue_id'] for values in batch)
+    artist_ids = set(values['artist_id'] for values in batch)
+    known = {'venue': set(), 'artist': set()}
+    for kind, id in db.session.execute(union_all(
+            select(literal('venue'), Venue.id).where(Venue.id.in_(venue_ids)),
+            select(literal('artist'), Artist.id).where(Artist.id.in_(artist_ids)))):
+        known[kind].add(id)
+    return known['venue'], known['artist']
+
+
+def check_shows(batch):
+    # splits (line, values) shows into those that can be written and
+    # (line, message) for those pointing at unknown venues or artists, or
+    # overlapping a booked show or an earlier line of the batch
+    known_venues, known_artists = known_references([values for line_num, values in batch])
+    known, rejected = [], []
+    for line_num, values in batch:
+        if values['venue_id'] in known_venues and values['artist_id'] in known_artists:
+            known.append((line_num, values))
+        else:
+            rejected.append((line_num, 'unknown venue_id or artist_id'))
+
+    rows = [values for line_num, values in known]
+    booked = bookings.booked(rows)
+    overlapping = bookings.overlapping(rows, skip=booked)
+    accepted = []
+    for n, (line_num, values) in enumerate(known):
+        if n in booked:
+            side, show_id = booked[n]
+            rejected.append((line_num, 'the {} is already booked at that time by show {}'.format(side, show_id)))
+        elif n in overlapping:
+            side, other = overlapping[n]
+            rejected.append((line_num, 'the {} is already booked at that time by line {}'.format(side, known[other][0])))
+        else:
+            accepted.append((line_num, values))
+    return accepted, sorted(rejected)
+
+
+def write_batch(model, batch):
+    # executemany of a single INSERT, which psycopg2 sends as multi-row VALUES
+    # pages; rows that carry an id become INSERT ... ON CONFLICT (id) DO UPDATE,
+    # or for shows an UPDATE by id
+    table = model.__table__
+    columns = [column.name for column in table.columns if column.name in batch[0] and column.name != 'id']
+
+    # the last row wins when an id repeats, ON CONFLICT cannot touch a row twice
+    upserts = {values['id']: {key: values[key] for key in columns + ['id']} for values in batch if values['id'] is not None}
+    if upserts and model is Show:
+        # show is partitioned on start_time, so its primary key is (id,
+        # start_time) and no unique index on id alone can serve ON CONFLICT:
+        # the shows that exist are updated by id, the rest inserted
+        updated = update_by_id(table, columns, list(upserts.values()))
+        missing = [row for id, row in upserts.items() if id not in updated]
+        if missing:
+            db.session.execute(insert(table), missing)
+        advance_sequence(table, max(upserts))
+    elif upserts:
+        statement = insert(table)
+        update = {key: statement.excluded[key] for key in columns}
+        update['updated_at'] = datetime.utcnow()
+        db.session.execute(statement.on_conflict_do_update(index_elements=['id'], set_=update), list(upserts.values()))
+        advance_sequence(table, max(upserts))
+
+    # numbered after the ids above, so none of them can be taken twice
+    new_rows = [{key: values[key] for key in columns} for values in batch if values['id'] is None]
+    if new_rows:
+        db.session.execute(insert(table), new_rows)
+
+
+def update_by_id(table, columns, rows):
+    # one UPDATE ... FROM (VALUES ...) for rows that carry an id; a row whose
+    # partition key changes moves to its new partition. Returns the ids found
+    given = values(*(column(key, table.c[key].type) for key in ['id'] + columns), name='given') \
+        .data([tuple(row[key] for key in ['id'] + columns) for row in rows])
+    statement = update(table).where(table.c.id == given.c.id) \
+        .values(dict({key: given.c[key] for key in columns}, updated_at=datetime.utcnow())) \
+        .returning(table.c.id)
+    return set(db.session.execute(statement).scalars())
+
+
+def advance_sequence(table, id):
+    # rows written with their own ids leave the serial sequence behind; move
+    # it past them (never back), or the next row the handlers create would
+    # collide with one of them, as benchmarks.generate does after its COPY
+    db.session.execute(text(
+        "SELECT setval(seq, :id) FROM (SELECT pg_get_serial_sequence(:table, 'id')::regclass AS seq) AS serial "
+        "WHERE :id > coalesce(pg_sequence_last_value(seq), 0)"), {'table': table.name, 'id': id})
+
+
+def refresh_summaries(kind, batch, last_id):
+    # show counters and the venue directory are brought up to date in the
+    # batch's transaction; venues inserted without an id were numbered after last_id
+    if kind == 'venues':
+        ids = [values['id'] for values in batch if values['id'] is not None]
+        directory.refresh(or_(Venue.id > last_id, Venue.id.in_(ids)))
+    elif kind == 'shows':
+        directory.refresh_venues(counters.recount_shows(batch))
+
+
+def tags_for(kind, batch):
+    if kind == 'venues':
+        return ['venues'] + ['venue:{}'.format(values['id']) for values in batch if values['id'] is not None]
+    if kind == 'artists':
+        return ['artists'] + ['artist:{}'.format(values['id']) for values in batch if values['id'] is not None]
+    return ['shows', 'venues'] + \
+        ['venue:{}'.format(id) for id in set(values['venue_id'] for values in batch)] + \
+        ['artist:{}'.format(id) for id in set(values['artist_id'] for values in batch)]
+
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(sorted(IMPORTERS)))
+@click.argument('file', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'format', type=click.Choice(['csv', 'jsonl']),
+              help='Input format, guessed from the file extension by default.')
+@click.option('--batch-size', type=int,
+              help='Rows written per transaction (default: IMPORT_BATCH_SIZE).')
+@with_appcontext
+def import_command(kind, file, format, batch_size):
+    """Bulk import venues, artists or shows from a CSV or JSONL file."""
+    model, form_class, to_values = IMPORTERS[kind]
+    rules = form_rules(form_class)
+    format = format or ('jsonl' if file.name.endswith(('.jsonl', '.json')) else 'csv')
+    batch_size = batch_size or current_app.config.get('IMPORT_BATCH_SIZE', 1000)
+
+    imported = rejected = 0
+    started = time.perf_counter()
+    batch = []
+
+    def flush(batch):
+        nonlocal imported, rejected
+        if kind == 'shows':
+            batch, failures = check_shows(batch)
+            for line_num, message in failures:
+                click.echo('line {}: {}'.format(line_num, message), err=True)
+            rejected += len(failures)
+
+        rows = [values for line_num, values in batch]
+        if rows:
+            last_id = db.session.query(func.max(Venue.id)).scalar() or 0
+            write_batch(model, rows)
+            refresh_summaries(kind, rows, last_id)
+            db.session.commit()
+            cache.invalidate(*tags_for(kind, rows))
+        imported += len(rows)
+
+        elapsed = time.perf_counter() - started
+        click.echo('{}: {} imported, {} rejected ({:.0f} rows/s)'.format(
+            kind, imported, rejected, imported / elapsed if elapsed else 0))
+
+    for line_num, row in read_rows(file, format):
+        try:
+            if not isinstance(row, dict):
+                raise RowError('not a valid {} record'.format(format))
+            values = to_values(row, rules)
+        except RowError as error:
+            click.echo('line {}: {}'.format(line_num, error), err=True)
+            rejected += 1
+            continue
+
+        batch.append((line_num, values))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+
+    if batch:
+        flush(batch)
+
+    elapsed = time.perf_counter() - started
+    click.echo('Imported {} {} in {:.2f}s ({:.0f} rows/s), {} rejected.'.format(
+        imported, kind, elapsed, imported / elapsed if elapsed else 0, rejected))
@@ -0,0 +1,162 @@
+import os
+import time
+from flask import Response, g, request
+from flask.signals import before_render_template, template_rendered
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter,
+                               Gauge, Histogram, generate_latest, multiprocess)
+from sqlalchemy import event
+from sqlalchemy.pool import Pool, QueuePool
+from cache import cache_lookup
+from sqlstats import request_queries
+
+#----------------------------------------------------------------------------#
+# Metrics.
+#----------------------------------------------------------------------------#
+
+# prometheus_client metrics are thread-safe; under gunicorn, set
+# PROMETHEUS_MULTIPROC_DIR so every worker writes its samples to a shared
+# directory and /metrics aggregates them (see gunicorn.conf.py).
+
+REQUESTS = Counter(
+    'fyyur_http_requests_total', 'HTTP requests handled.',
+    ['endpoint', 'method', 'status'])
+REQUEST_LATENCY = Histogram(
+    'fyyur_http_request_duration_seconds', 'Time to handle a request, including streamed bodies.',
+    ['endpoint'])
+IN_FLIGHT = Gauge(
+    'fyyur_http_requests_in_flight', 'Requests currently being handled.',
+    multiprocess_mode='livesum')
+TEMPLATE_RENDER = Histogram(
+    'fyyur_template_render_seconds', 'Time spent rendering a template.',
+    ['template'])
+DB_TIME = Histogram(
+    'fyyur_db_request_duration_seconds', 'Time spent executing SQL per request.',
+    ['endpoint'])
+DB_QUERIES = Histogram(
+    'fyyur_db_queries_per_request', 'SQL statements executed per request.',
+    ['endpoint'], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200, float('inf')))
+POOL_CHECKOUT = Histogram(
+    'fyyur_db_pool_checkout_seconds', 'Time waited to check a connection out of the pool.',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30, float('inf')))
+POOL_CONNECTIONS = Gauge(
+    'fyyur_db_pool_connections', 'Open database connections held by the pool.',
+    multiprocess_mode='livesum')
+POOL_CHECKED_OUT = Gauge(
+    'fyyur_db_pool_checked_out', 'Pooled connections currently in use.',
+    multiprocess_mode='livesum')
+POOL_CAPACITY = Gauge(
+    'fyyur_db_pool_capacity', 'Configured pool_size + max_overflow.',
+    multiprocess_mode='livesum')
+CACHE_LOOKUPS = Counter(
+    'fyyur_cache_lookups_total', 'Response/fragment cache lookups; hit ratio = hit / (hit + miss).',
+    ['result'])
+
+
+class TimedQueuePool(QueuePool):
+
+    def connect(self):
+        started = time.perf_counter()
+        connection = super(TimedQueuePool, self).connect()
+        POOL_CHECKOUT.observe(time.perf_counter() - started)
+        return connection
+
+
+def pool_connect(dbapi_connection, connection_record):
+    POOL_CONNECTIONS.inc()
+
+
+def pool_close(dbapi_connection, connection_record):
+    POOL_CONNECTIONS.dec()
+
+
+def pool_checkout(dbapi_connection, connection_record, connection_proxy):
+    POOL_CHECKED_OUT.inc()
+
+
+def pool_checkin(dbapi_connection, connection_record):
+    POOL_CHECKED_OUT.dec()
+
+
+class Metrics(object):
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        if not app.config['METRICS_ENABLED']:
+            return
+
+        # time pool checkouts unless a pool class was chosen explicitly (e.g.
+        # NullPool behind PgBouncer); must run before db.engine is first
+        # created. The options are copied, since the dict may be shared with
+        # the config module and every other app created from it
+        engine_options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+        if 'poolclass' not in engine_options:
+            engine_options['poolclass'] = TimedQueuePool
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+        if issubclass(engine_options['poolclass'], QueuePool):
+            POOL_CAPACITY.set(engine_options.get('pool_size', 5) + engine_options.get('max_overflow', 10))
+
+        if not event.contains(Pool, 'checkout', pool_checkout):
+            event.listen(Pool, 'connect', pool_connect)
+            event.listen(Pool, 'close', pool_close)
+            event.listen(Pool, 'close_detached', pool_close)
+            event.listen(Pool, 'checkout', pool_checkout)
+            event.listen(Pool, 'checkin', pool_checkin)
+
+        app.before_request(self.start)
+        app.after_request(self.record_status)
+        app.teardown_request(self.finish)
+        before_render_template.connect(self.render_started, app)
+        template_rendered.connect(self.render_finished, app)
+        request_queries.connect(self.record_queries)
+        cache_lookup.connect(self.record_cache_lookup)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+        app.extensions['metrics'] = self
+
+    def start(self):
+        IN_FLIGHT.inc()
+        g.metrics_started = time.perf_counter()
+
+    def record_status(self, response):
+        g.metrics_status = response.status_code
+        return response
+
+    def finish(self, exception=None):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        IN_FLIGHT.dec()
+        endpoint = request.endpoint or 'unknown'
+        status = 500 if exception is not None else g.pop('metrics_status', 500)
+        REQUEST_LATENCY.labels(endpoint).observe(time.perf_counter() - started)
+        REQUESTS.labels(endpoint, request.method, status).inc()
+
+    def render_started(self, sender, template, context, **extra):
+        g.setdefault('metrics_renders', []).append(time.perf_counter())
+
+    def render_finished(self, sender, template, context, **extra):
+        renders = g.get('metrics_renders')
+        if renders:
+            TEMPLATE_RENDER.labels(template.name or 'unknown').observe(time.perf_counter() - renders.pop())
+
+    def record_queries(self, sender, endpoint, queries, **extra):
+        endpoint = endpoint or 'unknown'
+        DB_TIME.labels(endpoint).observe(queries.total_ms / 1000)
+        DB_QUERIES.labels(endpoint).observe(queries.count)
+
+    def record_cache_lookup(self, sender, hit, **extra):
+        CACHE_LOOKUPS.labels('hit' if hit else 'miss').inc()
+
+    def view(self):
+        if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+metrics = Metrics()
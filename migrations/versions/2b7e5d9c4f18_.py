@@ -0,0 +1,34 @@
+"""show durations are capped at a day in the database too, like the form,
+the importer and the API
+
+Revision ID: 2b7e5d9c4f18
+Revises: 8d3b6e1f0a47
+Create Date: 2026-10-19 11:02:48.316907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b7e5d9c4f18'
+down_revision = '8d3b6e1f0a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # written past the form, e.g. with SQL or COPY: cut to a day, which only
+    # shortens their bookings, so none can start to overlap another
+    capped = op.get_bind().execute(sa.text(
+        'UPDATE show SET duration_minutes = 1440 WHERE duration_minutes > 1440')).rowcount
+    if capped:
+        print('show: {} durations over 1440 minutes cut to 1440'.format(capped))
+
+    op.drop_constraint('ck_show_duration_minutes', 'show', type_='check')
+    op.create_check_constraint('ck_show_duration_minutes', 'show', 'duration_minutes BETWEEN 1 AND 1440')
+
+
+def downgrade():
+    op.drop_constraint('ck_show_duration_minutes', 'show', type_='check')
+    op.create_check_constraint('ck_show_duration_minutes', 'show', 'duration_minutes > 0')
@@ -0,0 +1,60 @@
+"""precomputed /venues directory: one row per venue with its upcoming show
+count, replacing the area index on venue
+
+Revision ID: 3c5e8a1f9b20
+Revises: d81f4b6a2e57
+Create Date: 2026-10-18 16:42:37.904113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '3c5e8a1f9b20'
+down_revision = 'd81f4b6a2e57'
+branch_labels = None
+depends_on = None
+
+# the same rows directory.refresh() writes; later refreshes use the app
+# server's clock, this first fill the database's
+FILL_DIRECTORY = """
+INSERT INTO venue_directory (venue_id, name, city, state, genres, num_upcoming_shows, next_show_at)
+SELECT venue.id, venue.name, venue.city, venue.state, venue.genres, count(show.id), min(show.start_time)
+FROM venue
+LEFT OUTER JOIN show ON show.venue_id = venue.id AND show.start_time > localtimestamp
+GROUP BY venue.id
+"""
+
+
+def upgrade():
+    op.create_table('venue_directory',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('city', sa.String(length=120), nullable=True),
+    sa.Column('state', sa.String(length=120), nullable=True),
+    sa.Column('genres', postgresql.ARRAY(postgresql.ENUM(name='genre', create_type=False)), nullable=True),
+    sa.Column('num_upcoming_shows', sa.Integer(), nullable=False),
+    sa.Column('next_show_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['venue_id'], ['venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('venue_id')
+    )
+    op.execute(FILL_DIRECTORY)
+    # the table is new, so its indexes are built after the fill, in the transaction
+    op.create_index('ix_venue_directory_area', 'venue_directory', ['state', 'city', 'name', 'venue_id'], unique=False)
+    op.create_index('ix_venue_directory_genres', 'venue_directory', ['genres'], unique=False, postgresql_using='gin')
+    op.create_index('ix_venue_directory_next_show_at', 'venue_directory', ['next_show_at'], unique=False)
+
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_venue_state_city_name_id', table_name='venue', postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_venue_state_city_name_id', 'venue', ['state', 'city', 'name', 'id'], unique=False, postgresql_concurrently=True)
+
+    op.drop_index('ix_venue_directory_next_show_at', table_name='venue_directory')
+    op.drop_index('ix_venue_directory_genres', table_name='venue_directory')
+    op.drop_index('ix_venue_directory_area', table_name='venue_directory')
+    op.drop_table('venue_directory')
@@ -0,0 +1,29 @@
+"""add show venue/artist start_time indexes
+
+Revision ID: 3f6a2c9d81b7
+Revises: 9b0e93d41524
+Create Date: 2026-10-18 10:12:41.204318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6a2c9d81b7'
+down_revision = '9b0e93d41524'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_show_artist_id_start_time', table_name='show', postgresql_concurrently=True)
+        op.drop_index('ix_show_venue_id_start_time', table_name='show', postgresql_concurrently=True)
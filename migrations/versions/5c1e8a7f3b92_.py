@@ -0,0 +1,33 @@
+"""precomputed recommendations for the detail pages
+
+Revision ID: 5c1e8a7f3b92
+Revises: b93e6f2d7c18
+Create Date: 2026-10-19 01:12:07.884310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1e8a7f3b92'
+down_revision = 'b93e6f2d7c18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # filled by `flask recommendations refresh`
+    op.create_table('recommendation',
+    sa.Column('subject_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('rank', sa.SmallInteger(), nullable=False),
+    sa.Column('target_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), server_default=sa.text("timezone('utc', now())"), nullable=False),
+    sa.PrimaryKeyConstraint('subject_id', 'kind', 'rank')
+    )
+
+
+def downgrade():
+    op.drop_table('recommendation')
@@ -0,0 +1,26 @@
+"""add updated_at to venue, artist and show
+
+Revision ID: 5e09b7f3c2a4
+Revises: c52e8f1a6d30
+Create Date: 2026-10-18 12:36:50.871214
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e09b7f3c2a4'
+down_revision = 'c52e8f1a6d30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist', 'show'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=sa.text("timezone('utc', now())"), nullable=False))
+
+
+def downgrade():
+    for table in ('show', 'artist', 'venue'):
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,73 @@
+"""show counters on venue and artist, filled from show; the venue directory
+takes its count from them
+
+Revision ID: 7a2d94c0e6b1
+Revises: 3c5e8a1f9b20
+Create Date: 2026-10-18 19:08:51.226407
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a2d94c0e6b1'
+down_revision = '3c5e8a1f9b20'
+branch_labels = None
+depends_on = None
+
+# the same counts counters.recount() writes; later recounts use the app
+# server's clock, this first fill the database's
+FILL_COUNTERS = """
+UPDATE {table} SET
+  upcoming_shows_count = counts.upcoming,
+  past_shows_count = counts.past,
+  next_show_at = counts.next_show_at
+FROM (
+  SELECT {table}_id AS id,
+    count(*) FILTER (WHERE start_time > localtimestamp) AS upcoming,
+    count(*) FILTER (WHERE start_time <= localtimestamp) AS past,
+    min(start_time) FILTER (WHERE start_time > localtimestamp) AS next_show_at
+  FROM show
+  GROUP BY {table}_id
+) AS counts
+WHERE {table}.id = counts.id
+"""
+
+FILL_DIRECTORY_NEXT_SHOW_AT = """
+UPDATE venue_directory SET next_show_at = venue.next_show_at
+FROM venue
+WHERE venue.id = venue_directory.venue_id
+"""
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        # constant defaults, so adding the columns does not rewrite the tables
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('next_show_at', sa.DateTime(), nullable=True))
+        op.execute(FILL_COUNTERS.format(table=table))
+
+    # the roll job now finds due venues on venue itself
+    op.drop_index('ix_venue_directory_next_show_at', table_name='venue_directory')
+    op.drop_column('venue_directory', 'next_show_at')
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_venue_next_show_at', 'venue', ['next_show_at'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_artist_next_show_at', 'artist', ['next_show_at'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_artist_next_show_at', table_name='artist', postgresql_concurrently=True)
+        op.drop_index('ix_venue_next_show_at', table_name='venue', postgresql_concurrently=True)
+
+    op.add_column('venue_directory', sa.Column('next_show_at', sa.DateTime(), nullable=True))
+    op.execute(FILL_DIRECTORY_NEXT_SHOW_AT)
+    op.create_index('ix_venue_directory_next_show_at', 'venue_directory', ['next_show_at'], unique=False)
+
+    for table in ('artist', 'venue'):
+        op.drop_column(table, 'next_show_at')
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
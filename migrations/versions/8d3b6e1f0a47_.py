@@ -0,0 +1,39 @@
+"""venue directory area columns are not null, so the /venues keyset
+comparison sees every row
+
+Revision ID: 8d3b6e1f0a47
+Revises: 5c1e8a7f3b92
+Create Date: 2026-10-19 09:41:26.512870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d3b6e1f0a47'
+down_revision = '5c1e8a7f3b92'
+branch_labels = None
+depends_on = None
+
+# what directory.refresh() now copies for a venue without a name, city or state
+FILL_BLANKS = """
+UPDATE venue_directory SET
+  name = coalesce(name, ''),
+  city = coalesce(city, ''),
+  state = coalesce(state, '')
+WHERE name IS NULL OR city IS NULL OR state IS NULL
+"""
+
+
+def upgrade():
+    op.execute(FILL_BLANKS)
+    op.alter_column('venue_directory', 'name', existing_type=sa.String(), nullable=False)
+    op.alter_column('venue_directory', 'city', existing_type=sa.String(length=120), nullable=False)
+    op.alter_column('venue_directory', 'state', existing_type=sa.String(length=120), nullable=False)
+
+
+def downgrade():
+    op.alter_column('venue_directory', 'state', existing_type=sa.String(length=120), nullable=True)
+    op.alter_column('venue_directory', 'city', existing_type=sa.String(length=120), nullable=True)
+    op.alter_column('venue_directory', 'name', existing_type=sa.String(), nullable=True)
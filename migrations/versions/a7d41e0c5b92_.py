@@ -0,0 +1,27 @@
+"""add show start_time/id index for keyset pagination
+
+Revision ID: a7d41e0c5b92
+Revises: 3f6a2c9d81b7
+Create Date: 2026-10-18 11:03:17.552091
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d41e0c5b92'
+down_revision = '3f6a2c9d81b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_show_start_time_id', table_name='show', postgresql_concurrently=True)
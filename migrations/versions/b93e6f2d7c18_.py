@@ -0,0 +1,76 @@
+"""show duration and bookings that reject double-booked venues and artists
+
+Revision ID: b93e6f2d7c18
+Revises: e4b07c9d1a36
+Create Date: 2026-10-18 23:05:41.207315
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b93e6f2d7c18'
+down_revision = 'e4b07c9d1a36'
+branch_labels = None
+depends_on = None
+
+# models.SHOW_BOOKING_TRIGGERS as of this revision
+TRIGGERS = """
+CREATE OR REPLACE FUNCTION show_booking_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM show_booking WHERE show_id = OLD.id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO show_booking (show_id, venue_id, artist_id, during)
+        VALUES (NEW.id, NEW.venue_id, NEW.artist_id,
+                tsrange(NEW.start_time, NEW.start_time + NEW.duration_minutes * interval '1 minute'));
+    END IF;
+    RETURN NULL;
+END
+$$;
+CREATE OR REPLACE TRIGGER show_booking_insert_delete AFTER INSERT OR DELETE ON show
+    FOR EACH ROW EXECUTE FUNCTION show_booking_sync();
+CREATE OR REPLACE TRIGGER show_booking_update AFTER UPDATE OF venue_id, artist_id, start_time, duration_minutes ON show
+    FOR EACH ROW EXECUTE FUNCTION show_booking_sync();
+"""
+
+
+def upgrade():
+    op.add_column('show', sa.Column('duration_minutes', sa.Integer(), server_default='120', nullable=False))
+    op.create_check_constraint('ck_show_duration_minutes', 'show', 'duration_minutes > 0')
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.create_table('show_booking',
+    sa.Column('show_id', sa.Integer(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('during', postgresql.TSRANGE(), nullable=False),
+    postgresql.ExcludeConstraint((sa.column('venue_id'), '='), (sa.column('during'), '&&'), using='gist', name='show_booking_venue_excl'),
+    postgresql.ExcludeConstraint((sa.column('artist_id'), '='), (sa.column('during'), '&&'), using='gist', name='show_booking_artist_excl'),
+    sa.PrimaryKeyConstraint('show_id')
+    )
+
+    # existing shows, oldest listing first; a show overlapping one already
+    # booked keeps its row in show but gets no booking, so it blocks nothing
+    # until it is edited or relisted
+    op.execute(
+        'INSERT INTO show_booking (show_id, venue_id, artist_id, during) '
+        "SELECT id, venue_id, artist_id, tsrange(start_time, start_time + duration_minutes * interval '1 minute') "
+        'FROM show ORDER BY id ON CONFLICT DO NOTHING')
+    unbooked = op.get_bind().execute(sa.text(
+        'SELECT count(*) FROM show WHERE NOT EXISTS (SELECT 1 FROM show_booking WHERE show_id = show.id)')).scalar()
+    if unbooked:
+        print('show_booking: {} overlapping shows left unbooked'.format(unbooked))
+
+    op.execute(TRIGGERS)
+
+
+def downgrade():
+    op.execute('DROP TRIGGER show_booking_update ON show')
+    op.execute('DROP TRIGGER show_booking_insert_delete ON show')
+    op.execute('DROP FUNCTION show_booking_sync()')
+    op.drop_table('show_booking')
+    op.drop_constraint('ck_show_duration_minutes', 'show', type_='check')
+    op.drop_column('show', 'duration_minutes')
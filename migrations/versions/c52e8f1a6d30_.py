@@ -0,0 +1,35 @@
+"""add trigram and genre search indexes for venues and artists
+
+Revision ID: c52e8f1a6d30
+Revises: a7d41e0c5b92
+Create Date: 2026-10-18 11:48:05.117940
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c52e8f1a6d30'
+down_revision = 'a7d41e0c5b92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for table in ('venue', 'artist'):
+            op.create_index('ix_{}_name_trgm'.format(table), table, ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}, postgresql_concurrently=True)
+            op.create_index('ix_{}_city_trgm'.format(table), table, ['city'], unique=False, postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}, postgresql_concurrently=True)
+            op.create_index('ix_{}_genres'.format(table), table, ['genres'], unique=False, postgresql_using='gin', postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in ('artist', 'venue'):
+            op.drop_index('ix_{}_genres'.format(table), table_name=table, postgresql_concurrently=True)
+            op.drop_index('ix_{}_city_trgm'.format(table), table_name=table, postgresql_concurrently=True)
+            op.drop_index('ix_{}_name_trgm'.format(table), table_name=table, postgresql_concurrently=True)
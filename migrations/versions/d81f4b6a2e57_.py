@@ -0,0 +1,69 @@
+"""store genres as an array of the genre enum, cleaning up existing rows;
+index venues in area order for the paged directory
+
+Revision ID: d81f4b6a2e57
+Revises: 5e09b7f3c2a4
+Create Date: 2026-10-18 14:05:12.318620
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81f4b6a2e57'
+down_revision = '5e09b7f3c2a4'
+branch_labels = None
+depends_on = None
+
+GENRES = (
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+    'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz',
+    'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul',
+    'Other',
+)
+
+# existing rows hold nested arrays (the old edit venue handler stored a
+# tuple), comma-joined strings and stray braces or quotes; every element is
+# split on commas, matched case-insensitively, unknown values become
+# 'Other', and duplicates are dropped. ALTER ... USING cannot run a
+# subquery, so the cleanup lives in a temporary function.
+NORMALIZE_GENRES = """
+CREATE FUNCTION pg_temp.normalize_genres(genres varchar[]) RETURNS genre[]
+LANGUAGE sql STRICT IMMUTABLE AS $$
+  SELECT coalesce(array_agg(DISTINCT coalesce(known.name, 'Other') ORDER BY coalesce(known.name, 'Other')), '{}')
+  FROM unnest(genres) AS raw(value)
+  CROSS JOIN LATERAL regexp_split_to_table(raw.value, ',') AS part(value)
+  LEFT JOIN unnest(enum_range(NULL::genre)) AS known(name)
+    ON lower(known.name::text) = lower(btrim(part.value, ' {}"'))
+  WHERE btrim(part.value, ' {}"') <> ''
+$$
+"""
+
+
+def upgrade():
+    postgresql.ENUM(*GENRES, name='genre').create(op.get_bind())
+    op.execute(NORMALIZE_GENRES)
+    for table in ('venue', 'artist'):
+        op.alter_column(table, 'genres',
+               existing_type=postgresql.ARRAY(sa.VARCHAR()),
+               type_=postgresql.ARRAY(postgresql.ENUM(*GENRES, name='genre', create_type=False)),
+               postgresql_using='pg_temp.normalize_genres(genres)')
+    op.execute('DROP FUNCTION pg_temp.normalize_genres(varchar[])')
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.create_index('ix_venue_state_city_name_id', 'venue', ['state', 'city', 'name', 'id'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_venue_state_city_name_id', table_name='venue', postgresql_concurrently=True)
+
+    for table in ('artist', 'venue'):
+        op.alter_column(table, 'genres',
+               existing_type=postgresql.ARRAY(postgresql.ENUM(*GENRES, name='genre', create_type=False)),
+               type_=postgresql.ARRAY(sa.VARCHAR()),
+               postgresql_using='genres::varchar[]')
+    postgresql.ENUM(name='genre').drop(op.get_bind())
@@ -0,0 +1,93 @@
+"""partition show by month on start_time
+
+Revision ID: e4b07c9d1a36
+Revises: 7a2d94c0e6b1
+Create Date: 2026-10-18 21:30:14.551902
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b07c9d1a36'
+down_revision = '7a2d94c0e6b1'
+branch_labels = None
+depends_on = None
+
+# months created ahead of the current one, like SHOW_PARTITIONS_AHEAD
+MONTHS_AHEAD = 12
+
+INDEXES = [
+    ('ix_show_venue_id_start_time', ['venue_id', 'start_time']),
+    ('ix_show_artist_id_start_time', ['artist_id', 'start_time']),
+    ('ix_show_start_time_id', ['start_time', 'id']),
+]
+COLUMNS = 'id, artist_id, venue_id, start_time, updated_at'
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def create_show_table(**kwargs):
+    # id keeps drawing from the old table's sequence
+    op.create_table('show',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('show_id_seq'::regclass)"), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text("timezone('utc', now())"), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['artist.id'], ),
+    sa.ForeignKeyConstraint(['venue_id'], ['venue.id'], ),
+    **kwargs
+    )
+
+
+def swap_show_table():
+    # move the old table aside, with the names of its key and indexes
+    op.rename_table('show', 'show_old')
+    op.execute('ALTER TABLE show_old RENAME CONSTRAINT show_pkey TO show_old_pkey')
+    for name, columns in INDEXES:
+        op.drop_index(name, table_name='show_old')
+
+
+def finish_show_table():
+    op.execute('INSERT INTO show ({0}) SELECT {0} FROM show_old'.format(COLUMNS))
+    # built once the rows are in, on every partition
+    for name, columns in INDEXES:
+        op.create_index(name, 'show', columns, unique=False)
+    op.execute('ALTER SEQUENCE show_id_seq OWNED BY show.id')
+    op.drop_table('show_old')
+
+
+def upgrade():
+    swap_show_table()
+    # a partitioned table's primary key has to include the partition key
+    create_show_table(postgresql_partition_by='RANGE (start_time)')
+    op.create_primary_key('show_pkey', 'show', ['id', 'start_time'])
+    op.execute('CREATE TABLE show_default PARTITION OF show DEFAULT')
+
+    # one partition per month from the first show (or this month, if that
+    # is earlier or there are none) to MONTHS_AHEAD from now; later months
+    # are added by `flask partitions maintain`
+    first = op.get_bind().execute(sa.text("SELECT date_trunc('month', min(start_time)) FROM show_old")).scalar()
+    this_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    last = add_months(this_month, MONTHS_AHEAD)
+    month = min(first or this_month, this_month)
+    while month <= last:
+        op.execute("CREATE TABLE show_{:%Y_%m} PARTITION OF show FOR VALUES FROM ('{}') TO ('{}')".format(
+            month, month.isoformat(sep=' '), add_months(month, 1).isoformat(sep=' ')))
+        month = add_months(month, 1)
+
+    finish_show_table()
+
+
+def downgrade():
+    # detached months are left alone, only rows still in show come back
+    swap_show_table()
+    create_show_table()
+    op.create_primary_key('show_pkey', 'show', ['id'])
+    finish_show_table()
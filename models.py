@@ -1,9 +1,18 @@
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from flask_moment import Moment
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import ExcludeConstraint, TSRANGE
+from routing import RoutingSQLAlchemy
 
-db = SQLAlchemy()
+db = RoutingSQLAlchemy()
+
+# the only genres a venue or artist can have; stored as the postgres enum
+# `genre`, so adding one needs a migration (ALTER TYPE genre ADD VALUE)
+GENRES = (
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+    'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz',
+    'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul',
+    'Other',
+)
+GENRE = db.Enum(*GENRES, name='genre')
 
 #----------------------------------------------------------------------------#
 # Models.
@@ -11,10 +20,18 @@ db = SQLAlchemy()
 
 class Venue(db.Model):
     __tablename__ = 'venue'
+    # trigram indexes serve the ILIKE search on name and city, the array index the genre match
+    __table_args__ = (
+        db.Index('ix_venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_venue_city_trgm', 'city', postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}),
+        db.Index('ix_venue_genres', 'genres', postgresql_using='gin'),
+        # the counters roll job looks for venues whose next show has started
+        db.Index('ix_venue_next_show_at', 'next_show_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
-    genres = db.Column(db.ARRAY(db.String()))
+    genres = db.Column(db.ARRAY(GENRE))
     address = db.Column(db.String(200))
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
@@ -24,6 +41,13 @@ class Venue(db.Model):
     seeking_description = db.Column(db.String)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
+    # show counters, maintained by counters.py instead of counting shows
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # start of the earliest upcoming show, when the counters next change
+    next_show_at = db.Column(db.DateTime)
+    # bumped on every write, drives the ETag/Last-Modified of the detail pages
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=db.text("timezone('utc', now())"))
     shows = db.relationship('Show', backref='venue', lazy=True)
 
     # return a dictionary of venues
@@ -50,18 +74,30 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'artist'
+    # trigram indexes serve the ILIKE search on name and city, the array index the genre match
+    __table_args__ = (
+        db.Index('ix_artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_artist_city_trgm', 'city', postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}),
+        db.Index('ix_artist_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_artist_next_show_at', 'next_show_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String()))
+    genres = db.Column(db.ARRAY(GENRE))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(120))
     website = db.Column(db.String(120))
+    # see Venue
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=db.text("timezone('utc', now())"))
     shows = db.relationship('Show', backref='artist', lazy=True)
 
 
@@ -88,13 +124,35 @@ class Artist(db.Model):
 
 # TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
 
+# length of a show when none is given
+SHOW_MINUTES = 120
+
 class Show(db.Model):
     __tablename__ = 'show'
+    # past/upcoming lookups filter on venue or artist plus a start_time range
+    __table_args__ = (
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        # keyset pagination of the /shows listing
+        db.Index('ix_show_start_time_id', 'start_time', 'id'),
+        # an empty range would overlap nothing and slip past show_booking, a
+        # longer one hold a venue for days; the form allows 1 to 1440 too
+        db.CheckConstraint('duration_minutes BETWEEN 1 AND 1440', name='ck_show_duration_minutes'),
+        # one partition per month, see partitions.py
+        {'postgresql_partition_by': 'RANGE (start_time)'},
+    )
 
-    id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     artist_id = db.Column(db.Integer, db.ForeignKey('artist.id'), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'), nullable=False)
-    start_time = db.Column(db.DateTime, nullable=False)
+    # part of the primary key only because a partitioned table's key must
+    # contain the partition key; ids stay unique on their own
+    start_time = db.Column(db.DateTime, primary_key=True)
+    # in minutes; the show holds its venue and artist from start_time for
+    # that long, see ShowBooking
+    duration_minutes = db.Column(db.Integer, nullable=False, default=SHOW_MINUTES, server_default=str(SHOW_MINUTES))
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=db.text("timezone('utc', now())"))
+    __mapper_args__ = {'primary_key': [id]}
 
 
     # returns a dictionary of show artists and venue respectively
@@ -116,6 +174,86 @@ class Show(db.Model):
             'start_time': self.start_time.strftime('%Y-%m-%d %H:%M:%S')
         }
 
+# a new show table always has a partition to write to
+db.event.listen(Show.__table__, 'after_create', db.DDL('CREATE TABLE show_default PARTITION OF show DEFAULT'))
+
+class ShowBooking(db.Model):
+    # the time each show holds its venue and artist, one row per show. show
+    # is partitioned by month, and an exclusion constraint there could only
+    # compare shows within a partition, so the overlap checks live here,
+    # where one GiST index covers every month. Rows are written by triggers
+    # on show (SHOW_BOOKING_TRIGGERS), so every write path is checked.
+    __tablename__ = 'show_booking'
+    __table_args__ = (
+        ExcludeConstraint(('venue_id', '='), ('during', '&&'), name='show_booking_venue_excl', using='gist'),
+        ExcludeConstraint(('artist_id', '='), ('during', '&&'), name='show_booking_artist_excl', using='gist'),
+    )
+
+    show_id = db.Column(db.Integer, primary_key=True)
+    venue_id = db.Column(db.Integer, nullable=False)
+    artist_id = db.Column(db.Integer, nullable=False)
+    # [start_time, start_time + duration)
+    during = db.Column(TSRANGE, nullable=False)
+
+
+SHOW_BOOKING_TRIGGERS = """
+CREATE OR REPLACE FUNCTION show_booking_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM show_booking WHERE show_id = OLD.id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO show_booking (show_id, venue_id, artist_id, during)
+        VALUES (NEW.id, NEW.venue_id, NEW.artist_id,
+                tsrange(NEW.start_time, NEW.start_time + NEW.duration_minutes * interval '1 minute'));
+    END IF;
+    RETURN NULL;
+END
+$$;
+CREATE OR REPLACE TRIGGER show_booking_insert_delete AFTER INSERT OR DELETE ON show
+    FOR EACH ROW EXECUTE FUNCTION show_booking_sync();
+CREATE OR REPLACE TRIGGER show_booking_update AFTER UPDATE OF venue_id, artist_id, start_time, duration_minutes ON show
+    FOR EACH ROW EXECUTE FUNCTION show_booking_sync();
+"""
+
+# btree_gist lets the exclusion constraints compare ids with =
+db.event.listen(ShowBooking.__table__, 'before_create', db.DDL('CREATE EXTENSION IF NOT EXISTS btree_gist'))
+db.event.listen(db.metadata, 'after_create', db.DDL(SHOW_BOOKING_TRIGGERS))
+
+class VenueDirectory(db.Model):
+    # precomputed /venues listing, one row per venue, kept current by
+    # directory.refresh (see directory.py); rows go when their venue does
+    __tablename__ = 'venue_directory'
+    __table_args__ = (
+        # the listing is read in area order
+        db.Index('ix_venue_directory_area', 'state', 'city', 'name', 'venue_id'),
+        db.Index('ix_venue_directory_genres', 'genres', postgresql_using='gin'),
+    )
+
+    venue_id = db.Column(db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), primary_key=True)
+    # '' rather than NULL for a venue without them: NULL would drop the row
+    # out of the (state, city, name, venue_id) keyset comparison of /venues
+    name = db.Column(db.String, nullable=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
+    genres = db.Column(db.ARRAY(GENRE))
+    num_upcoming_shows = db.Column(db.Integer, nullable=False, default=0)
+
+class Recommendation(db.Model):
+    # precomputed discovery links for the detail pages, the top
+    # RECOMMENDATIONS_K of each list, rebuilt by `flask recommendations
+    # refresh` (see recommendations.py). A page reads all of its lists with
+    # one range scan of the primary key.
+    __tablename__ = 'recommendation'
+
+    # an artist's similar_artists and fitting_venues, a venue's fitting_artists
+    subject_id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), primary_key=True)
+    rank = db.Column(db.SmallInteger, primary_key=True)
+    target_id = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False, server_default=db.text("timezone('utc', now())"))
+
 # ======================================
 
 # class Venue(db.Model):
@@ -0,0 +1,160 @@
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import column, select, table, text
+from models import db, Artist, Venue
+from cache import cache
+import bookings
+import counters
+import directory
+
+#----------------------------------------------------------------------------#
+# Show partitions.
+#----------------------------------------------------------------------------#
+
+# show is range partitioned on start_time, one partition per month named
+# show_YYYY_MM, plus show_default for anything outside them, so no write is
+# ever rejected. Queries that bound start_time (upcoming shows, the recent
+# past on the detail pages, /shows?from=) only touch the months they need.
+# `flask partitions maintain` should run daily: it creates the months ahead,
+# moves rows out of show_default into a month of their own, and detaches
+# months older than SHOW_RETENTION_MONTHS into plain show_archive_YYYY_MM
+# tables, to be dumped or dropped as needed.
+
+def month_of(value):
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month):
+    return 'show_{:%Y_%m}'.format(month)
+
+
+def shows_since():
+    # the venue and artist pages list upcoming shows and the recent past,
+    # which keeps their queries on the latest months
+    return datetime.now() - timedelta(days=current_app.config.get('PAST_SHOWS_DAYS', 365))
+
+
+def attached():
+    # months that have a partition of their own
+    names = db.session.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = 'show'::regclass"))
+    return sorted(datetime.strptime(name, 'show_%Y_%m') for name, in names if name != 'show_default')
+
+
+def months_between(first, last):
+    month = month_of(first)
+    while month <= last:
+        yield month
+        month = add_months(month, 1)
+
+
+def create(month):
+    # the new month takes over its rows from show_default before it is
+    # attached; attaching checks show_default holds none of them any more
+    name = partition_name(month)
+    bounds = {'start': month, 'end': add_months(month, 1)}
+    db.session.execute(text('CREATE TABLE {} (LIKE show INCLUDING CONSTRAINTS)'.format(name)))
+    moved = db.session.execute(text(
+        'WITH moved AS (DELETE FROM show_default WHERE start_time >= :start AND start_time < :end RETURNING *) '
+        'INSERT INTO {} SELECT * FROM moved'.format(name)), bounds).rowcount
+    db.session.execute(text("ALTER TABLE show ATTACH PARTITION {} FOR VALUES FROM ('{start}') TO ('{end}')".format(
+        name, **{key: value.isoformat(sep=' ') for key, value in bounds.items()})))
+    if moved:
+        bookings.rebook(name)
+    return moved
+
+
+def ensure(months):
+    # gives each of months a partition unless it has one; returns the new ones
+    created = sorted(set(months) - set(attached()))
+    for month in created:
+        create(month)
+    return created
+
+
+def detach(month):
+    # the month leaves show and is kept as the plain table show_archive_YYYY_MM
+    # (added to it if the month was archived before); its venues and artists
+    # are recounted, returns the ids whose counters changed
+    name = partition_name(month)
+    archive = 'show_archive_{:%Y_%m}'.format(month)
+    db.session.execute(text('ALTER TABLE show DETACH PARTITION {}'.format(name)))
+    bookings.unbook(name)
+    # a detached partition keeps the id default and the foreign keys, which
+    # would tie show_id_seq, venue and artist to the archive; drop them
+    db.session.execute(text('ALTER TABLE {} ALTER COLUMN id DROP DEFAULT'.format(name)))
+    foreign_keys = db.session.execute(text(
+        "SELECT conname FROM pg_constraint WHERE conrelid = CAST(:name AS regclass) AND contype = 'f'"), {'name': name})
+    for constraint, in foreign_keys.all():
+        db.session.execute(text('ALTER TABLE {} DROP CONSTRAINT {}'.format(name, constraint)))
+
+    detached = table(name, column('venue_id'), column('artist_id'))
+    venue_ids = counters.recount(Venue, Venue.id.in_(select(detached.c.venue_id).distinct()))
+    artist_ids = counters.recount(Artist, Artist.id.in_(select(detached.c.artist_id).distinct()))
+    if venue_ids:
+        directory.refresh_venues(venue_ids)
+
+    if db.session.execute(text('SELECT to_regclass(:archive)'), {'archive': archive}).scalar() is None:
+        db.session.execute(text('ALTER TABLE {} RENAME TO {}'.format(name, archive)))
+    else:
+        db.session.execute(text('INSERT INTO {} SELECT * FROM {}'.format(archive, name)))
+        db.session.execute(text('DROP TABLE {}'.format(name)))
+    return venue_ids, artist_ids
+
+
+def maintain(ahead, retain=None, now=None):
+    now = now or datetime.now()
+
+    # this month and the next `ahead`, and any month a row in show_default needs
+    months = list(months_between(now, add_months(month_of(now), ahead)))
+    months += [month for month, in db.session.execute(text(
+        "SELECT DISTINCT date_trunc('month', start_time) FROM show_default"))]
+    created = ensure(months)
+
+    detached, venue_ids, artist_ids = [], [], []
+    if retain:
+        cutoff = add_months(month_of(now), -retain)
+        for month in attached():
+            if month < cutoff:
+                venues, artists = detach(month)
+                detached.append(month)
+                venue_ids += venues
+                artist_ids += artists
+
+    return created, detached, venue_ids, artist_ids
+
+
+partitions_command = AppGroup('partitions', help='Maintain the monthly partitions of the show table.')
+
+
+@partitions_command.command('maintain')
+@click.option('--ahead', type=int,
+              help='Months to create ahead of the current one (default: SHOW_PARTITIONS_AHEAD).')
+@click.option('--retain', type=int,
+              help='Months of history to keep attached, 0 for all (default: SHOW_RETENTION_MONTHS).')
+def maintain_command(ahead, retain):
+    """Create upcoming month partitions and detach expired ones."""
+    config = current_app.config
+    ahead = config.get('SHOW_PARTITIONS_AHEAD', 12) if ahead is None else ahead
+    retain = config.get('SHOW_RETENTION_MONTHS', 0) if retain is None else retain
+
+    created, detached, venue_ids, artist_ids = maintain(ahead, retain)
+    db.session.commit()
+    if detached:
+        cache.invalidate('shows')
+        counters.invalidate(venue_ids, artist_ids)
+
+    for month in created:
+        click.echo('created {}'.format(partition_name(month)))
+    for month in detached:
+        click.echo('detached {}'.format(partition_name(month)))
+    click.echo('{} partitions created, {} detached.'.format(len(created), len(detached)))
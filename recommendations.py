@@ -0,0 +1,296 @@
+import csv
+import io
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import and_, func, or_, select, text
+from sqlalchemy.orm import aliased
+from models import db, Artist, Venue, Show, Recommendation, GENRES
+from cache import cache
+
+#----------------------------------------------------------------------------#
+# Recommendations.
+#----------------------------------------------------------------------------#
+
+# the detail pages link to similar artists, to the venues that fit an artist
+# and to the artists that fit a venue. Scoring every pair is offline work:
+# `flask recommendations refresh` scores them with sparse and dense matrix
+# products, a block of rows at a time, and keeps the top RECOMMENDATIONS_K of
+# each list in the recommendation table, which the pages and the API read
+# with one index range scan. numpy and scipy are imported by the job only,
+# so web workers never load them.
+
+# the lists of each kind of page
+LISTS = {
+    'artists': ('similar_artists', 'fitting_venues'),
+    'venues': ('fitting_artists',),
+}
+
+# every signal scores a pair between 0 and 1, and the weights of a list add
+# up to 1. Artists are similar when they share genres and have played the
+# same venues; an artist fits a venue that books its genres, in its city or
+# state, and is looking for talent while the artist looks for venues
+SIMILARITY_WEIGHTS = {'genres': 0.4, 'billing': 0.6}
+FIT_WEIGHTS = {'genres': 0.5, 'city': 0.25, 'state': 0.1, 'seeking': 0.15}
+
+# scores held in memory at once: a block of rows against every candidate
+BLOCK_CELLS = 1 << 22
+
+#----------------------------------------------------------------------------#
+# Lookups.
+#----------------------------------------------------------------------------#
+
+def targets(recommendation=Recommendation, artist=Artist, venue=Venue):
+    # the artist or venue each recommendation points at
+    return [
+        (artist, and_(recommendation.kind != 'fitting_venues', artist.id == recommendation.target_id)),
+        (venue, and_(recommendation.kind == 'fitting_venues', venue.id == recommendation.target_id)),
+    ]
+
+
+def lookup(kind, id):
+    # every list of a venue or artist with the name and image of each
+    # target; targets deleted since the last refresh drop out
+    statement = select(
+        Recommendation.kind, Recommendation.rank, Recommendation.target_id,
+        func.coalesce(Artist.name, Venue.name), func.coalesce(Artist.image_link, Venue.image_link),
+        Recommendation.score,
+    ).select_from(Recommendation)
+    for model, condition in targets():
+        statement = statement.outerjoin(model, condition)
+    return statement.where(
+        Recommendation.subject_id == id, Recommendation.kind.in_(LISTS[kind]),
+        or_(Artist.id.isnot(None), Venue.id.isnot(None)))
+
+
+def group(kind, rows):
+    # {list: [{id, name, image_link, score}]} in rank order, every list present
+    lists = {name: [] for name in LISTS[kind]}
+    for name, rank, id, target_name, image_link, score in sorted(rows, key=lambda row: (row[0], row[1])):
+        if name in lists:
+            lists[name].append({'id': id, 'name': target_name, 'image_link': image_link, 'score': round(score, 3)})
+    return lists
+
+
+def fetch(kind, id):
+    return group(kind, db.session.execute(lookup(kind, id)).all())
+
+
+def tags(lists):
+    # a page showing the lists goes stale with a refresh and with its targets
+    return ['recommendations'] + [
+        '{}:{}'.format('venue' if name == 'fitting_venues' else 'artist', item['id'])
+        for name, items in lists.items() for item in items]
+
+
+def modified(kind, id):
+    # when the lists of a venue or artist last changed: the refresh that
+    # wrote them, or an edit of one of their targets
+    artist, venue = aliased(Artist), aliased(Venue)
+    statement = select(func.max(func.greatest(Recommendation.computed_at, artist.updated_at, venue.updated_at))) \
+        .select_from(Recommendation)
+    for model, condition in targets(Recommendation, artist, venue):
+        statement = statement.outerjoin(model, condition)
+    return statement.where(Recommendation.subject_id == id, Recommendation.kind.in_(LISTS[kind])).scalar_subquery()
+
+#----------------------------------------------------------------------------#
+# Scoring.
+#----------------------------------------------------------------------------#
+
+# the features of every artist or venue, one row each in id order
+Side = namedtuple('Side', 'ids genres cities states seeking')
+
+
+def load(model, seeking, codes):
+    # genres as L2-normalized rows, so their product is the cosine of two
+    # genre lists; cities and states as integer codes shared by both sides
+    # (-1 when missing, matching nothing)
+    import numpy as np
+    rows = db.session.execute(
+        select(model.id, model.genres, model.city, model.state, seeking).order_by(model.id)).all()
+    genre_index = {genre: column for column, genre in enumerate(GENRES)}
+
+    genres = np.zeros((len(rows), len(GENRES)), dtype=np.float32)
+    cities = np.full(len(rows), -1, dtype=np.int64)
+    states = np.full(len(rows), -1, dtype=np.int64)
+    for row, (id, row_genres, city, state, row_seeking) in enumerate(rows):
+        for genre in row_genres or []:
+            if genre in genre_index:
+                genres[row, genre_index[genre]] = 1
+        if city and state:
+            cities[row] = codes.setdefault((city.strip().lower(), state), len(codes))
+        if state:
+            states[row] = codes.setdefault(state, len(codes))
+    norms = np.linalg.norm(genres, axis=1, keepdims=True)
+    genres /= np.where(norms > 0, norms, 1)
+
+    return Side(
+        ids=np.array([row[0] for row in rows], dtype=np.int64), genres=genres, cities=cities, states=states,
+        seeking=np.array([bool(row[4]) for row in rows], dtype=np.float32))
+
+
+def billing(artists, venues, days):
+    # artists x venues, the venues each artist played in the last `days` or
+    # is booked at. A venue that hosts many artists says little about any
+    # two of them, so it weighs log(artists / its artists), and the rows are
+    # L2-normalized: the product of two rows is the cosine of their venues
+    import numpy as np
+    from scipy import sparse
+    statement = select(Show.artist_id, Show.venue_id) \
+        .where(Show.start_time > datetime.now() - timedelta(days=days))
+    # millions of shows: COPY them out and parse the text in one go. Repeat
+    # visits are folded by the sparse matrix, not by a DISTINCT, which
+    # Postgres underestimates and spills to disk
+    buffer = io.StringIO()
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert('COPY ({}) TO STDOUT WITH CSV'.format(cursor.mogrify(
+        *compiled(statement)).decode()), buffer)
+    text = buffer.getvalue().strip()
+    pairs = np.fromstring(text.replace('\n', ','), dtype=np.int64, sep=',').reshape(-1, 2) if text \
+        else np.zeros((0, 2), dtype=np.int64)
+
+    # shows of venues or artists deleted meanwhile are dropped
+    rows = np.searchsorted(artists.ids, pairs[:, 0])
+    columns = np.searchsorted(venues.ids, pairs[:, 1])
+    known = (rows < len(artists.ids)) & (columns < len(venues.ids))
+    known[known] &= (artists.ids[rows[known]] == pairs[known, 0]) & (venues.ids[columns[known]] == pairs[known, 1])
+    played = sparse.csr_matrix(
+        (np.ones(known.sum(), dtype=np.float32), (rows[known], columns[known])),
+        shape=(len(artists.ids), len(venues.ids)))
+    played.sum_duplicates()
+    played.data[:] = 1
+
+    artists_per_venue = np.asarray(played.sum(axis=0)).ravel()
+    weights = np.log1p(max(played.shape[0], 1) / np.maximum(artists_per_venue, 1)).astype(np.float32)
+    played = played @ sparse.diags(weights)
+    norms = np.sqrt(np.asarray(played.multiply(played).sum(axis=1)).ravel())
+    return (sparse.diags(1 / np.where(norms > 0, norms, 1)) @ played).tocsr().astype(np.float32)
+
+
+def compiled(statement):
+    # SQL and parameters for cursor.mogrify
+    query = statement.compile(dialect=db.engine.dialect)
+    return str(query), query.params
+
+
+def blocks(count, candidates):
+    step = max(1, BLOCK_CELLS // max(candidates, 1))
+    for start in range(0, count, step):
+        yield start, min(start + step, count)
+
+
+def best(scores, subject_ids, target_ids, k):
+    # (subject id, rank, target id, score) for the k best positive scores of
+    # each row of a block
+    import numpy as np
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+    for subject_id, columns, row_scores in zip(subject_ids.tolist(), top.tolist(), top_scores.tolist()):
+        for rank, (column, score) in enumerate(zip(columns, row_scores), start=1):
+            if score <= 0:
+                break
+            yield subject_id, rank, int(target_ids[column]), round(score, 4)
+
+
+def similar_artists(artists, played, k):
+    # genre cosine and billing cosine of a block of artists with every artist
+    import numpy as np
+    played_t = played.T.tocsr()
+    for start, stop in blocks(len(artists.ids), len(artists.ids)):
+        scores = SIMILARITY_WEIGHTS['genres'] * (artists.genres[start:stop] @ artists.genres.T)
+        scores += SIMILARITY_WEIGHTS['billing'] * (played[start:stop] @ played_t).toarray()
+        # not similar to themselves
+        scores[np.arange(stop - start), np.arange(start, stop)] = 0
+        yield from best(scores, artists.ids[start:stop], artists.ids, k)
+
+
+def fitting(subjects, candidates, k):
+    # fit of a block of subjects (artists or venues) with every candidate of
+    # the other kind; every signal is symmetric, so either side can lead
+    for start, stop in blocks(len(subjects.ids), len(candidates.ids)):
+        scores = FIT_WEIGHTS['genres'] * (subjects.genres[start:stop] @ candidates.genres.T)
+        scores += FIT_WEIGHTS['city'] * ((subjects.cities[start:stop, None] == candidates.cities[None, :]) &
+                                         (candidates.cities[None, :] >= 0))
+        scores += FIT_WEIGHTS['state'] * ((subjects.states[start:stop, None] == candidates.states[None, :]) &
+                                          (candidates.states[None, :] >= 0))
+        scores += FIT_WEIGHTS['seeking'] * (subjects.seeking[start:stop, None] * candidates.seeking[None, :])
+        yield from best(scores, subjects.ids[start:stop], candidates.ids, k)
+
+
+# rewriting the ~2M rows in place would leave as many dead rows behind
+# every night, so the lists go into a new table that takes the place of
+# recommendation at the end of the transaction; its primary key is built
+# once, after the load, and keeps its name
+CREATE_NEXT = 'CREATE TABLE recommendation_next (LIKE recommendation INCLUDING DEFAULTS)'
+INDEX_NEXT = 'ALTER TABLE recommendation_next ADD CONSTRAINT recommendation_next_pkey PRIMARY KEY (subject_id, kind, rank)'
+SWAP = [
+    'DROP TABLE recommendation',
+    'ALTER TABLE recommendation_next RENAME TO recommendation',
+    'ALTER TABLE recommendation RENAME CONSTRAINT recommendation_next_pkey TO recommendation_pkey',
+    'ANALYZE recommendation',
+]
+
+
+def write(lists):
+    # replaces every row in the session's transaction, so the pages keep
+    # reading the previous lists until the commit (they only wait on the
+    # swap itself); rows are streamed in with COPY
+    db.session.execute(text(CREATE_NEXT))
+    cursor = db.session.connection().connection.cursor()
+    written = 0
+    for kind, rows in lists:
+        while True:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            chunk = 0
+            for subject_id, rank, target_id, score in rows:
+                writer.writerow((subject_id, kind, rank, target_id, score))
+                chunk += 1
+                if chunk == 100000:
+                    break
+            if not chunk:
+                break
+            buffer.seek(0)
+            cursor.copy_expert('COPY recommendation_next (subject_id, kind, rank, target_id, score) FROM STDIN WITH CSV', buffer)
+            written += chunk
+    db.session.execute(text(INDEX_NEXT))
+    for statement in SWAP:
+        db.session.execute(text(statement))
+    return written
+
+
+def refresh(k, days):
+    codes = {}
+    artists = load(Artist, Artist.seeking_venue, codes)
+    venues = load(Venue, Venue.seeking_talent, codes)
+    played = billing(artists, venues, days)
+    return write([
+        ('similar_artists', similar_artists(artists, played, k)),
+        ('fitting_venues', fitting(artists, venues, k)),
+        ('fitting_artists', fitting(venues, artists, k)),
+    ])
+
+
+recommendations_command = AppGroup('recommendations', help='Maintain the recommendations of the detail pages.')
+
+
+@recommendations_command.command('refresh')
+@click.option('--top', type=int, help='Entries kept per list (default: RECOMMENDATIONS_K).')
+@click.option('--days', type=int, help='Days of past shows that count as playing a venue (default: RECOMMENDATIONS_SHOW_DAYS).')
+def refresh_command(top, days):
+    """Recompute similar artists and artist-venue fit."""
+    started = time.perf_counter()
+    written = refresh(top or current_app.config.get('RECOMMENDATIONS_K', 10),
+                      days or current_app.config.get('RECOMMENDATIONS_SHOW_DAYS', 365))
+    db.session.commit()
+    cache.invalidate('recommendations')
+    click.echo('Wrote {} recommendations in {:.1f}s.'.format(written, time.perf_counter() - started))
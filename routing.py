@@ -0,0 +1,149 @@
+import itertools
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, has_app_context, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import event, orm, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+#----------------------------------------------------------------------------#
+# Read replicas.
+#----------------------------------------------------------------------------#
+
+# replicas are registered as flask_sqlalchemy binds ('replica_0', ...), so
+# they get the same engine options as the primary. Views wrapped in
+# use_replica read from a healthy replica picked round-robin; everything
+# else, every flush, and any client that wrote in the last few seconds
+# (read-your-writes) stays on the primary.
+
+class ReplicaSet(object):
+
+    def __init__(self, db, app, keys, check_interval):
+        self.db = db
+        self.app = app
+        self.keys = keys
+        self.check_interval = check_interval
+        self.down = {}
+        self.engines = {}
+        self.cycle = itertools.cycle(keys)
+        self.lock = threading.Lock()
+
+    def engine(self, key):
+        engine = self.db.get_engine(self.app, bind=key)
+        self.engines[engine] = key
+        return engine
+
+    def mark_down(self, key):
+        with self.lock:
+            self.down[key] = time.monotonic()
+
+    def healthy(self, key):
+        with self.lock:
+            down_since = self.down.get(key)
+            if down_since is None:
+                return True
+            if time.monotonic() - down_since < self.check_interval:
+                return False
+            # due for a recheck; other requests keep skipping it meanwhile
+            self.down[key] = time.monotonic()
+        try:
+            with self.engine(key).connect() as connection:
+                connection.execute(text('SELECT 1'))
+        except DBAPIError:
+            return False
+        with self.lock:
+            self.down.pop(key, None)
+        return True
+
+    def pick(self):
+        for _ in range(len(self.keys)):
+            with self.lock:
+                key = next(self.cycle)
+            if self.healthy(key):
+                return self.engine(key)
+        return None
+
+
+def replica_error(exception_context):
+    # a replica that refuses connections or drops one leaves the rotation
+    # until its next health check
+    engine = exception_context.engine
+    replicas = current_app.extensions.get('replicas') if has_app_context() else None
+    if replicas is None or engine not in replicas.engines:
+        return
+    if exception_context.is_disconnect or exception_context.connection is None:
+        replicas.mark_down(replicas.engines[engine])
+        g.db_replica_failed = True
+
+
+class RoutingSession(SignallingSession):
+
+    def get_bind(self, mapper=None, clause=None):
+        if not self._flushing and has_app_context():
+            replica = g.get('db_replica')
+            if replica is not None:
+                return replica
+        return SignallingSession.get_bind(self, mapper, clause)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def record_write(db_session, flush_context):
+    if has_app_context():
+        g.db_wrote = True
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def init_app(self, app):
+        app.config.setdefault('SQLALCHEMY_REPLICA_URIS', [])
+        app.config.setdefault('REPLICA_HEALTH_CHECK_INTERVAL', 30)
+        app.config.setdefault('REPLICA_READ_YOUR_WRITES_SECONDS', 5)
+
+        binds = app.config.setdefault('SQLALCHEMY_BINDS', None) or {}
+        keys = []
+        for index, uri in enumerate(app.config['SQLALCHEMY_REPLICA_URIS']):
+            key = 'replica_{}'.format(index)
+            binds[key] = uri
+            keys.append(key)
+        app.config['SQLALCHEMY_BINDS'] = binds or None
+
+        SQLAlchemy.init_app(self, app)
+
+        replicas = None
+        if keys:
+            replicas = ReplicaSet(self, app, keys, app.config['REPLICA_HEALTH_CHECK_INTERVAL'])
+        app.extensions['replicas'] = replicas
+        app.after_request(remember_write)
+        if not event.contains(Engine, 'handle_error', replica_error):
+            event.listen(Engine, 'handle_error', replica_error)
+
+
+def remember_write(response):
+    # keep this client on the primary long enough to read its own writes
+    if g.pop('db_wrote', False):
+        session['db_primary_until'] = time.time() + current_app.config['REPLICA_READ_YOUR_WRITES_SECONDS']
+    return response
+
+
+def use_replica(view):
+    # route the reads of this view to a replica unless the client just wrote
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        replicas = current_app.extensions.get('replicas')
+        if replicas is not None and session.get('db_primary_until', 0) < time.time():
+            g.db_replica = replicas.pick()
+        try:
+            return view(*args, **kwargs)
+        except DBAPIError:
+            # the replica went away during this request: retry once on the primary
+            if not g.pop('db_replica_failed', False):
+                raise
+            g.db_replica = None
+            current_app.extensions['sqlalchemy'].db.session.rollback()
+            return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,68 @@
+from sqlalchemy import cast, func, or_
+from models import db, Artist, Venue, GENRES
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+# name and city are matched through pg_trgm GIN indexes, which serve
+# ILIKE '%term%' as an index scan, and genres through a GIN index on the
+# array, so no search falls back to a full table scan.
+
+def matching_genres(term):
+    # genres are stored as the `genre` enum, so map the term onto its values
+    return [genre for genre in GENRES if genre.lower() == term.lower()]
+
+
+def canonical_genre(term):
+    # the enum value a ?genre= argument names, whatever its case
+    genres = matching_genres(term)
+    if not genres:
+        raise ValueError('unknown genre {!r}'.format(term))
+    return genres[0]
+
+
+def genre_filter(model, genre):
+    # genres @> ARRAY[genre]::genre[] is served by the GIN index on genres
+    return model.genres.op('@>')(cast([genre], model.genres.type))
+
+
+def search_filter(model, term):
+    pattern = '%{}%'.format(term)
+    conditions = [model.name.ilike(pattern), model.city.ilike(pattern)]
+
+    genres = matching_genres(term)
+    if genres:
+        conditions.append(model.genres.op('&&')(cast(genres, model.genres.type)))
+
+    return or_(*conditions)
+
+
+def rank(model, term):
+    # name matches rank above city matches, closer matches first
+    return func.greatest(
+        func.similarity(model.name, term),
+        func.similarity(model.city, term) * 0.5
+    )
+
+
+def venues(term, limit=50):
+    # upcoming show counts come from the maintained counter, no join on show
+    return db.session.query(
+            Venue.id, Venue.name, Venue.city, Venue.state,
+            Venue.upcoming_shows_count.label('num_upcoming_shows')
+        ).filter(search_filter(Venue, term)) \
+        .order_by(rank(Venue, term).desc(), Venue.name) \
+        .limit(limit) \
+        .all()
+
+
+def artists(term, limit=50):
+    # upcoming show counts come from the maintained counter, no join on show
+    return db.session.query(
+            Artist.id, Artist.name, Artist.city, Artist.state,
+            Artist.upcoming_shows_count.label('num_upcoming_shows')
+        ).filter(search_filter(Artist, term)) \
+        .order_by(rank(Artist, term).desc(), Artist.name) \
+        .limit(limit) \
+        .all()
@@ -0,0 +1,120 @@
+import heapq
+import json
+import logging
+import time
+from flask import g, has_app_context, request
+from flask.signals import Namespace
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('fyyur.sql')
+
+# sent once per request with the finished RequestQueries, for exporters such as metrics
+request_queries = Namespace().signal('request-queries')
+
+#----------------------------------------------------------------------------#
+# Per-request SQL statistics.
+#----------------------------------------------------------------------------#
+
+# cursor events are listened to on the Engine class, so the counters keep
+# working when flask_sqlalchemy rebuilds db.engine after a URI change.
+
+class RequestQueries(object):
+
+    def __init__(self, keep):
+        self.keep = keep
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest = []
+
+    def record(self, statement, elapsed_ms):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        entry = (elapsed_ms, self.count, statement)
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, entry)
+        else:
+            heapq.heappushpop(self.slowest, entry)
+
+    def slowest_statements(self):
+        return [
+            {'ms': round(elapsed_ms, 3), 'statement': statement}
+            for elapsed_ms, position, statement in sorted(self.slowest, reverse=True)
+        ]
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info['query_started'].pop()) * 1000
+    if has_app_context() and 'sql_queries' in g:
+        g.sql_queries.record(statement, elapsed_ms)
+
+
+def handle_error(exception_context):
+    # a failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_started'):
+        connection.info['query_started'].pop()
+
+
+class SQLStats(object):
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SQL_STATS_HEADERS', False)
+        app.config.setdefault('SQL_SLOW_REQUEST_QUERIES', 50)
+        app.config.setdefault('SQL_SLOW_REQUEST_MS', 500)
+        app.config.setdefault('SQL_SLOWEST_STATEMENTS', 3)
+
+        if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+            event.listen(Engine, 'handle_error', handle_error)
+
+        self.config = app.config
+        app.before_request(self.start)
+        app.after_request(self.add_headers)
+        # teardown runs after streamed bodies finish, so their queries are counted too
+        app.teardown_request(self.log)
+        app.extensions['sql_stats'] = self
+
+    def start(self):
+        g.sql_queries = RequestQueries(self.config['SQL_SLOWEST_STATEMENTS'])
+
+    def add_headers(self, response):
+        queries = g.get('sql_queries')
+        if queries is not None and self.config['SQL_STATS_HEADERS']:
+            response.headers['X-SQL-Queries'] = str(queries.count)
+            response.headers['X-SQL-Time-ms'] = '{:.3f}'.format(queries.total_ms)
+        return response
+
+    def log(self, exception=None):
+        queries = g.pop('sql_queries', None)
+        if queries is None:
+            return
+
+        record = {
+            'route': request.endpoint,
+            'method': request.method,
+            'path': request.path,
+            'queries': queries.count,
+            'db_ms': round(queries.total_ms, 3),
+        }
+        request_queries.send(self, endpoint=request.endpoint, queries=queries)
+
+        slow = queries.count > self.config['SQL_SLOW_REQUEST_QUERIES'] or \
+            queries.total_ms > self.config['SQL_SLOW_REQUEST_MS']
+        if slow:
+            record['slowest'] = queries.slowest_statements()
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
+
+
+sql_stats = SQLStats()
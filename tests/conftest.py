@@ -0,0 +1,115 @@
+import os
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+# the suite runs against a scratch PostgreSQL database that has pg_trgm and
+# btree_gist available, given as TEST_DATABASE_URL; its public schema is
+# dropped and rebuilt from the migrations, so never point it at real data
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+if TEST_DATABASE_URL:
+    # read by config.py when the app is created
+    os.environ['DATABASE_URL'] = TEST_DATABASE_URL
+    os.environ['DATABASE_REPLICA_URLS'] = ''
+    os.environ['CACHE_ENABLED'] = '0'
+
+TABLES = 'venue, artist, show, show_booking, venue_directory, recommendation'
+
+
+def migrate(app, revision='head'):
+    # empty the database and run the migrations up to revision
+    from flask_migrate import upgrade
+    from models import db
+    with app.app_context():
+        db.session.remove()
+        with db.engine.begin() as connection:
+            connection.execute(text('DROP SCHEMA public CASCADE; CREATE SCHEMA public'))
+        upgrade(directory=MIGRATIONS, revision=revision)
+
+
+@pytest.fixture(scope='session')
+def app():
+    if not TEST_DATABASE_URL:
+        pytest.skip('TEST_DATABASE_URL is not set')
+    from flask_migrate import Migrate
+    from app import create_app
+    from models import db
+
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    Migrate(app, db)
+    migrate(app)
+    return app
+
+
+@pytest.fixture(autouse=True)
+def tables(app):
+    # every test starts from empty tables
+    from models import db
+    yield
+    with app.app_context():
+        db.session.remove()
+        db.session.execute(text('TRUNCATE {} RESTART IDENTITY CASCADE'.format(TABLES)))
+        db.session.commit()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def statements():
+    # the SQL statements sent while the test runs, in order
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(Engine, 'before_cursor_execute', record)
+
+
+@pytest.fixture
+def seed(app):
+    # seed(venues=, artists=, shows=) adds rows the way the handlers would
+    # leave them, counters and venue directory included, and returns their
+    # ids. Shows go to venues and artists in turn, three hours apart from
+    # first (by default so that half of them are in the past), so none is
+    # double-booked
+    from models import db, Artist, Venue, Show
+    import counters
+    import directory
+
+    def seed(venues=0, artists=0, shows=0, venue_ids=None, artist_ids=None, cities=(('San Francisco', 'CA'),), first=None):
+        with app.app_context():
+            new_venues = [
+                Venue(name='Venue {}'.format(n), city=cities[n % len(cities)][0], state=cities[n % len(cities)][1],
+                      address='{} Main St'.format(n), genres=['Jazz'], image_link='https://example.com/v.png')
+                for n in range(venues)]
+            new_artists = [
+                Artist(name='Artist {}'.format(n), city='San Francisco', state='CA', genres=['Jazz'],
+                       image_link='https://example.com/a.png')
+                for n in range(artists)]
+            db.session.add_all(new_venues + new_artists)
+            db.session.flush()
+            venue_ids = venue_ids or [venue.id for venue in new_venues]
+            artist_ids = artist_ids or [artist.id for artist in new_artists]
+
+            first = first or datetime.now().replace(microsecond=0) - timedelta(hours=3 * (shows // 2))
+            db.session.add_all([
+                Show(venue_id=venue_ids[n % len(venue_ids)], artist_id=artist_ids[n % len(artist_ids)],
+                     start_time=first + timedelta(hours=3 * n))
+                for n in range(shows)])
+            db.session.flush()
+
+            counters.recount(Venue)
+            counters.recount(Artist)
+            directory.refresh()
+            db.session.commit()
+            return [venue.id for venue in new_venues], [artist.id for artist in new_artists]
+    return seed
@@ -0,0 +1,37 @@
+import pytest
+
+VENUE = {
+    'name': 'Hall', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St', 'genres': ['Jazz'],
+    'facebook_link': 'https://facebook.com/hall', 'seeking_talent': True,
+}
+
+
+@pytest.mark.parametrize('kind, body, fields', [
+    ('venues', dict(VENUE, name=5, genres=[1], seeking_talent=None), ['name', 'genres']),
+    ('venues', dict(VENUE, city={'name': 'Austin'}, seeking_talent='yes'), ['city']),
+    ('shows', {'venue_id': 1, 'artist_id': True, 'start_time': 123, 'duration_minutes': 90}, ['artist_id', 'start_time']),
+])
+def test_create_rejects_values_of_the_wrong_type(client, seed, kind, body, fields):
+    seed(venues=1, artists=1)
+    response = client.post('/api/v1/{}'.format(kind), json=body)
+    assert response.status_code == 400
+    error = response.get_json()['error']
+    assert [part.split(':')[0] for part in error.split('; ')] == fields
+
+
+def test_create_takes_json_numbers_and_booleans(client, seed):
+    (venue,), (artist,) = seed(venues=1, artists=1)
+    assert client.post('/api/v1/venues', json=VENUE).status_code == 201
+    response = client.post('/api/v1/shows', json={
+        'venue_id': venue, 'artist_id': artist, 'start_time': '2030-01-01 20:00:00', 'duration_minutes': 90})
+    assert response.status_code == 201
+
+
+def test_tour_reports_a_date_of_the_wrong_type(client, seed):
+    (venue,), (artist,) = seed(venues=1, artists=1)
+    response = client.post('/api/v1/shows/batch', json={'artist_id': artist, 'dates': [
+        {'venue_id': venue, 'start_time': 123}, {'venue_id': venue, 'start_time': '2030-01-01 20:00:00'}]})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [date['line'] for date in body['created']] == [2]
+    assert body['failed'] == [{'line': 1, 'error': 'start_time: expected a string'}]
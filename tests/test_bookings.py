@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+
+def posted_shows(app):
+    from models import db
+    with app.app_context():
+        return db.session.execute(text('SELECT duration_minutes FROM show ORDER BY id')).scalars().all()
+
+
+@pytest.mark.parametrize('duration', ['0', '-30', '1441', 'two hours'])
+def test_show_form_rejects_a_bad_duration(app, client, seed, duration):
+    (venue,), (artist,) = seed(venues=1, artists=1)
+    response = client.post('/shows/create', data={
+        'venue_id': venue, 'artist_id': artist, 'start_time': '2030-01-01 20:00', 'duration_minutes': duration})
+    assert b'Show could not be listed' in response.data
+    assert posted_shows(app) == []
+
+
+def test_show_form_defaults_the_duration(app, client, seed):
+    (venue,), (artist,) = seed(venues=1, artists=1)
+    for start_time, duration in (('2030-01-01 20:00', ''), ('2030-01-02 20:00', '90')):
+        response = client.post('/shows/create', data={
+            'venue_id': venue, 'artist_id': artist, 'start_time': start_time, 'duration_minutes': duration})
+        assert b'Show was successfully listed!' in response.data
+    assert posted_shows(app) == [120, 90]
+
+
+@pytest.mark.parametrize('duration', [0, -30, 1441, 7 * 24 * 60])
+def test_show_table_rejects_a_bad_duration(app, seed, duration):
+    from models import db
+    (venue,), (artist,) = seed(venues=1, artists=1)
+    with app.app_context():
+        with pytest.raises(IntegrityError, match='ck_show_duration_minutes'):
+            db.session.execute(text(
+                'INSERT INTO show (venue_id, artist_id, start_time, duration_minutes) VALUES (:venue, :artist, :start, :duration)'),
+                {'venue': venue, 'artist': artist, 'start': datetime.now() + timedelta(days=1), 'duration': duration})
+        db.session.rollback()
+
+
+def test_migration_caps_longer_durations(app, capsys):
+    # a week-long show written before the cap is cut to a day, and its
+    # booking with it
+    from conftest import MIGRATIONS, migrate
+    from flask_migrate import upgrade
+    from models import db
+
+    migrate(app, '8d3b6e1f0a47')
+    start = datetime.now().replace(microsecond=0) + timedelta(days=7)
+    with app.app_context():
+        db.session.execute(text("INSERT INTO venue (id, name) VALUES (1, 'Venue')"))
+        db.session.execute(text("INSERT INTO artist (id, name) VALUES (1, 'Artist')"))
+        db.session.execute(text(
+            'INSERT INTO show (venue_id, artist_id, start_time, duration_minutes) VALUES (1, 1, :start, 10080)'),
+            {'start': start})
+        db.session.commit()
+        capsys.readouterr()
+
+        upgrade(directory=MIGRATIONS)
+        assert 'show: 1 durations over 1440 minutes cut to 1440' in capsys.readouterr().out
+        assert db.session.execute(text('SELECT upper(during) FROM show_booking')).scalar() == start + timedelta(days=1)
+
+
+def test_migration_books_existing_shows_and_rejects_double_bookings(app, capsys):
+    # from the revision before show_booking: the backfill books shows in id
+    # order and leaves the later of two overlapping ones unbooked, then the
+    # triggers and exclusion constraints reject a new overlap by name
+    from conftest import MIGRATIONS, migrate
+    from flask_migrate import upgrade
+    from models import db
+    import bookings
+
+    migrate(app, 'e4b07c9d1a36')
+    start = datetime.now().replace(microsecond=0) + timedelta(days=7)
+    with app.app_context():
+        db.session.execute(text("INSERT INTO venue (id, name) VALUES (1, 'Venue'), (2, 'Other venue')"))
+        db.session.execute(text("INSERT INTO artist (id, name) VALUES (1, 'Artist'), (2, 'Other artist')"))
+        db.session.execute(text(
+            'INSERT INTO show (id, venue_id, artist_id, start_time) VALUES '
+            '(1, 1, 1, :start), (2, 1, 2, :start + interval \'1 hour\'), (3, 2, 2, :start + interval \'1 day\')'),
+            {'start': start})
+        db.session.execute(text("SELECT setval('show_id_seq', 3)"))
+        db.session.commit()
+        capsys.readouterr()
+
+        upgrade(directory=MIGRATIONS)
+        assert 'show_booking: 1 overlapping shows left unbooked' in capsys.readouterr().out
+        assert db.session.execute(text('SELECT show_id FROM show_booking ORDER BY show_id')).scalars().all() == [1, 3]
+
+        for venue_id, artist_id, side in ((1, 2, 'venue'), (2, 1, 'artist')):
+            with pytest.raises(IntegrityError) as error:
+                db.session.execute(text(
+                    'INSERT INTO show (venue_id, artist_id, start_time) VALUES (:venue, :artist, :start)'),
+                    {'venue': venue_id, 'artist': artist_id, 'start': start + timedelta(minutes=30)})
+            db.session.rollback()
+            assert bookings.conflict(error.value) == side
+
+
+def test_tour_lists_free_dates_and_rejects_booked_ones(app, seed, monkeypatch):
+    import importer
+    import tours
+    from models import db
+    (venue, other_venue), (artist, other_artist) = seed(venues=2, artists=2)
+    start = datetime.now().replace(microsecond=0) + timedelta(days=7)
+    with app.app_context():
+        db.session.execute(text(
+            'INSERT INTO show (venue_id, artist_id, start_time) VALUES (:venue, :artist, :start)'),
+            {'venue': venue, 'artist': other_artist, 'start': start})
+        db.session.commit()
+
+        # the first check misses the show booked above, as if it had been
+        # listed between the check and the INSERT: the exclusion violation
+        # sends the tour back through the check
+        check_shows = importer.check_shows
+        checks = []
+
+        def racing_check(batch):
+            checks.append(batch)
+            return (batch, []) if len(checks) == 1 else check_shows(batch)
+        monkeypatch.setattr(importer, 'check_shows', racing_check)
+
+        stamp = '%Y-%m-%d %H:%M:%S'
+        created, failed = tours.schedule(artist, [
+            (1, {'venue_id': str(venue), 'start_time': (start + timedelta(hours=1)).strftime(stamp)}),
+            (2, {'venue_id': str(other_venue), 'start_time': (start + timedelta(days=1)).strftime(stamp)}),
+            (3, {'venue_id': str(other_venue), 'start_time': (start + timedelta(days=2)).strftime(stamp),
+                 'duration_minutes': '0'}),
+        ])
+        assert len(checks) == 2
+        assert list(created) == [2]
+        assert [line for line, message in failed] == [1, 3]
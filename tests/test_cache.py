@@ -0,0 +1,59 @@
+from flask import Flask, g
+from cache import ResponseCache
+
+
+def test_replica_read_is_not_stored_right_after_an_invalidation(monkeypatch):
+    # a replica can still be behind the write that bumped the tag: its read
+    # must not be cached under the new version, the primary's may be
+    app = Flask(__name__)
+    app.config['REPLICA_READ_YOUR_WRITES_SECONDS'] = 5
+    cache = ResponseCache(app)
+    now = [1000.0]
+    monkeypatch.setattr('cache.time.time', lambda: now[0])
+
+    with app.app_context():
+        cache.invalidate('venue:1')
+        g.db_replica = object()
+        cache.store('page', 'stale', {'venue:1'})
+        assert cache.lookup('page') is None
+
+        g.db_replica = None
+        cache.store('page', 'fresh', {'venue:1'})
+        assert cache.lookup('page') == 'fresh'
+
+        now[0] += 6
+        g.db_replica = object()
+        cache.store('later', 'replica', {'venue:1'})
+        assert cache.lookup('later') == 'replica'
+
+
+def test_streamed_page_is_cached_after_its_last_chunk():
+    # a miss must stream as the view renders; the body is stored once the
+    # last chunk is out, and served whole from then on
+    from flask import Response, stream_with_context
+    app = Flask(__name__)
+    cache = ResponseCache(app)
+    rendered = []
+
+    @app.route('/shows')
+    @cache.cached('shows')
+    def shows():
+        def generate():
+            for n in range(3):
+                rendered.append(n)
+                yield 'row {}\n'.format(n)
+        return Response(stream_with_context(generate()))
+
+    client = app.test_client()
+    response = client.get('/shows', buffered=False)
+    assert response.headers['X-Cache'] == 'MISS'
+    # stream_with_context renders up to the first chunk, no further
+    assert rendered == [0]
+    assert next(response.response) == b'row 0\n'
+    assert b''.join(response.response) == b'row 1\nrow 2\n'
+    response.close()
+
+    cached = client.get('/shows')
+    assert cached.headers['X-Cache'] == 'HIT'
+    assert cached.data == b'row 0\nrow 1\nrow 2\n'
+    assert rendered == [0, 1, 2]
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+import pytest
+
+# a detail page runs its ETag state query, the one query that loads the
+# venue or artist with its shows and their counterparts, and the read of
+# its recommendation lists, however many shows it has
+DETAIL_PAGE_STATEMENTS = 3
+
+
+@pytest.fixture
+def pages(seed):
+    # {kind: [(path, shows)]}: a venue and an artist with a single show, and
+    # a venue and an artist with 40 shows, each with a different counterpart
+    (venue,), (artist,) = seed(venues=1, artists=1, shows=1)
+    (busy_venue,), _ = seed(venues=1)
+    seed(artists=40, shows=40, venue_ids=[busy_venue])
+    _, (busy_artist,) = seed(artists=1)
+    seed(venues=40, shows=40, artist_ids=[busy_artist])
+    return {
+        'venues': [('/venues/{}'.format(venue), 1), ('/venues/{}'.format(busy_venue), 40)],
+        'artists': [('/artists/{}'.format(artist), 1), ('/artists/{}'.format(busy_artist), 40)],
+    }
+
+
+@pytest.mark.parametrize('kind', ['venues', 'artists'])
+def test_detail_page_statement_count_does_not_grow_with_shows(client, pages, statements, kind):
+    counterpart = b'Artist 39' if kind == 'venues' else b'Venue 39'
+    for path, shows in pages[kind]:
+        statements.clear()
+        response = client.get(path)
+        assert response.status_code == 200
+        assert len(statements) == DETAIL_PAGE_STATEMENTS, (path, shows, statements)
+        assert (counterpart in response.data) == (shows == 40)
+
+
+@pytest.mark.parametrize('kind', ['venues', 'artists'])
+def test_if_modified_since_sees_a_show_start(client, seed, monkeypatch, kind):
+    # a show starting moves it from upcoming to past without writing a row;
+    # a client revalidating with If-Modified-Since only must get the new page
+    venue_ids, artist_ids = seed(venues=1, artists=1, shows=1, first=datetime.now() + timedelta(hours=1))
+    path = '/{}/{}'.format(kind, (venue_ids if kind == 'venues' else artist_ids)[0])
+    page = client.get(path)
+    since = {'If-Modified-Since': page.headers['Last-Modified']}
+    assert client.get(path, headers=since).status_code == 304
+
+    class Later(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.now(tz) + timedelta(hours=2)
+    monkeypatch.setattr('views.{}.datetime'.format(kind), Later)
+
+    later = client.get(path, headers=since)
+    assert later.status_code == 200
+    assert later.headers['ETag'] != page.headers['ETag']
+
+
+@pytest.mark.parametrize('kind', ['venues', 'artists'])
+def test_past_shows_beyond_the_window_are_linked(client, seed, kind):
+    # the page lists the last PAST_SHOWS_DAYS days of past shows but counts
+    # them all; the older ones are one link away, on the API
+    import html
+    import re
+    venue_ids, artist_ids = seed(venues=1, artists=1, shows=2, first=datetime.now() - timedelta(days=400))
+    seed(shows=1, venue_ids=venue_ids, artist_ids=artist_ids, first=datetime.now() - timedelta(days=1))
+    page = client.get('/{}/{}'.format(kind, (venue_ids if kind == 'venues' else artist_ids)[0])).get_data(as_text=True)
+
+    assert '3 Past Shows' in page
+    assert 'Shows of the last 365 days.' in page
+    earlier = html.unescape(re.search(r'href="([^"]*/api/v1/shows[^"]*)"', page).group(1))
+    assert len(client.get(earlier).get_json()['data']) == 2
+
+
+def test_past_shows_within_the_window_are_not_labelled(client, seed):
+    (venue,), _ = seed(venues=1, artists=1, shows=2)
+    assert b'Earlier shows' not in client.get('/venues/{}'.format(venue)).data
@@ -0,0 +1,32 @@
+import csv
+import io
+import json
+import pytest
+import exporter
+
+
+def test_csv_value_joins_any_list():
+    assert exporter.csv_value(['Jazz', 'Folk']) == 'Jazz,Folk'
+    assert exporter.csv_value([1, 2]) == '1,2'
+    assert exporter.csv_value([]) == ''
+
+
+@pytest.mark.parametrize('kind, count', [('venues', 3), ('artists', 2), ('shows', 4)])
+def test_export_lists_every_row(client, seed, kind, count):
+    seed(venues=3, artists=2, shows=4)
+
+    response = client.get('/export/{}.csv'.format(kind))
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert len(rows) == count
+
+    lines = client.get('/export/{}.jsonl'.format(kind)).get_data(as_text=True).splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [record['id'] for record in records] == [int(row['id']) for row in rows]
+
+    if kind == 'shows':
+        assert rows[0]['venue_name'] == records[0]['venue_name'] == 'Venue 0'
+        assert rows[0]['artist_name'] == records[0]['artist_name'] == 'Artist 0'
+    else:
+        assert rows[0]['genres'] == 'Jazz'
+        assert records[0]['genres'] == ['Jazz']
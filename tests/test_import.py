@@ -0,0 +1,50 @@
+import json
+from sqlalchemy import text
+
+VENUE = {
+    'name': 'Imported Hall', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St', 'phone': '',
+    'genres': 'Jazz', 'image_link': 'https://example.com/v.png', 'facebook_link': 'https://facebook.com/hall',
+}
+
+
+def import_rows(app, kind, tmp_path, rows):
+    path = tmp_path / '{}.jsonl'.format(kind)
+    path.write_text(''.join(json.dumps(row) + '\n' for row in rows))
+    result = app.test_cli_runner().invoke(args=['import', kind, str(path)])
+    assert result.exit_code == 0, result.output
+    return result
+
+
+def test_import_with_ids_moves_the_sequence_past_them(app, client, tmp_path):
+    # the next venue created through the form must not collide with an
+    # imported id
+    from models import db
+    import_rows(app, 'venues', tmp_path, [dict(VENUE, id=50), dict(VENUE, name='Numbered Hall')])
+    response = client.post('/venues/create', data=dict(VENUE, name='Form Hall', genres=['Jazz']))
+    assert b'Venue Form Hall was successfully listed!' in response.data
+    with app.app_context():
+        ids = dict(db.session.execute(text('SELECT name, id FROM venue')).all())
+    assert ids['Imported Hall'] == 50
+    assert ids['Form Hall'] > ids['Numbered Hall'] > 50
+
+
+def test_import_updates_a_show_by_id(app, seed, tmp_path):
+    # show's primary key is (id, start_time): a show imported again by id is
+    # updated in place, here moved to another month (and partition), and
+    # its booking moves with it; an unknown id is inserted
+    from datetime import datetime, timedelta
+    from models import db
+    month = datetime.now().replace(day=10, hour=20, minute=0, second=0, microsecond=0)
+    (venue,), (artist,) = seed(venues=1, artists=1, shows=1, first=month + timedelta(days=31))
+    moved = (month + timedelta(days=92)).replace(day=10, hour=21)
+    result = import_rows(app, 'shows', tmp_path, [
+        {'id': 1, 'venue_id': venue, 'artist_id': artist, 'start_time': str(moved), 'duration_minutes': 90},
+        {'id': 7, 'venue_id': venue, 'artist_id': artist, 'start_time': str(moved + timedelta(days=1))},
+    ])
+    assert 'Imported 2 shows' in result.output
+    with app.app_context():
+        shows = db.session.execute(text(
+            'SELECT id, start_time, duration_minutes, tableoid::regclass::text FROM show ORDER BY id')).all()
+        partition = moved.strftime('show_%Y_%m')
+        assert shows == [(1, moved, 90, partition), (7, moved + timedelta(days=1), 120, partition)]
+        assert db.session.execute(text('SELECT lower(during) FROM show_booking WHERE show_id = 1')).scalar() == moved
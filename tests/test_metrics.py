@@ -0,0 +1,15 @@
+from flask import Flask
+from sqlalchemy.pool import NullPool
+from metrics import Metrics, TimedQueuePool
+
+
+def test_pool_timing_leaves_the_configured_options_alone():
+    # the options dict is the config module's, shared by every app created
+    # from it; a pool class chosen there (NullPool behind PgBouncer) stays
+    for options, poolclass in (({'pool_size': 5}, TimedQueuePool), ({'poolclass': NullPool}, NullPool)):
+        configured = dict(options)
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+        Metrics(app)
+        assert app.config['SQLALCHEMY_ENGINE_OPTIONS']['poolclass'] is poolclass
+        assert options == configured
@@ -0,0 +1,11 @@
+from datetime import datetime
+import partitions
+
+
+def test_migration_creates_this_month_to_months_ahead(app):
+    # on an empty show table too: until `flask partitions maintain` first
+    # runs, upcoming shows must not pile up in show_default
+    with app.app_context():
+        now = datetime.now()
+        expected = set(partitions.months_between(now, partitions.add_months(partitions.month_of(now), 12)))
+        assert expected <= set(partitions.attached())
@@ -0,0 +1,27 @@
+from sqlalchemy import text
+
+
+def test_refresh_swaps_in_a_new_table(app, seed):
+    # each refresh loads a new table and renames it over the old one, so
+    # the previous lists leave no dead rows behind; the primary key keeps
+    # its name, as the model and migrations know it
+    import recommendations
+    from models import db
+    seed(venues=4, artists=6, shows=24)
+    with app.app_context():
+        relation = "SELECT 'recommendation'::regclass::oid"
+        before = db.session.execute(text(relation)).scalar()
+        lists = []
+        for run in range(2):
+            written = recommendations.refresh(5, 365)
+            db.session.commit()
+            lists.append(db.session.execute(text(
+                'SELECT subject_id, kind, rank, target_id FROM recommendation ORDER BY 1, 2, 3')).all())
+            assert written == len(lists[-1]) > 0
+
+        assert lists[0] == lists[1]
+        assert db.session.execute(text(relation)).scalar() != before
+        assert db.session.execute(text("SELECT to_regclass('recommendation_next')")).scalar() is None
+        assert db.session.execute(text(
+            "SELECT conname FROM pg_constraint WHERE conrelid = 'recommendation'::regclass AND contype = 'p'"
+        )).scalar() == 'recommendation_pkey'
@@ -0,0 +1,76 @@
+from datetime import datetime
+from sqlalchemy import and_, select, text
+from models import db, Artist, Venue, Show
+import partitions
+
+# the detail pages look up a venue's or an artist's shows after a point in
+# time: the recent past and upcoming shows (partitions.shows_since), or the
+# upcoming ones only. Each month they read must be served by the matching
+# (id, start_time) index, never by a scan of the whole month
+PAGES = {
+    'venue': (Venue, Show.venue_id, Artist, Show.artist_id, 'ix_show_venue_id_start_time'),
+    'artist': (Artist, Show.artist_id, Venue, Show.venue_id, 'ix_show_artist_id_start_time'),
+}
+
+
+def add_history(venue_ids, artist_ids):
+    # a show every 30 minutes from 13 months back to the last month with a
+    # partition, each month in its own partition; a venue or an artist plays
+    # every 30000 minutes, so nothing is double-booked
+    first = partitions.add_months(partitions.month_of(datetime.now()), -13)
+    partitions.ensure(partitions.months_between(first, datetime.now()))
+    last = partitions.attached()[-1]
+    db.session.execute(text(
+        'INSERT INTO show (venue_id, artist_id, start_time) '
+        "SELECT :venue + n % 1000, :artist + n * 7 % 1000, CAST(:first AS timestamp) + n * interval '30 minutes' "
+        'FROM generate_series(0, :count - 1) n'),
+        {'venue': venue_ids[0], 'artist': artist_ids[0], 'first': first,
+         'count': int((partitions.add_months(last, 1) - first).total_seconds() // 1800)})
+    db.session.commit()
+    db.session.execute(text('ANALYZE venue, artist, show'))
+    db.session.commit()
+
+
+def show_scans(statement):
+    # how the plan reads each show partition: the partitioned index an
+    # index scan comes from, or the node type of any other scan. show_default
+    # is left out: it is empty once `flask partitions maintain` has run
+    compiled = statement.compile(dialect=db.engine.dialect)
+    plan = db.session.connection().exec_driver_sql('EXPLAIN (FORMAT JSON) ' + str(compiled), compiled.params).scalar()
+
+    scans = []
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.get('Plans', []))
+        if 'Index Name' in node:
+            root = db.session.execute(text('SELECT CAST(pg_partition_root(CAST(:index AS regclass)) AS text)'),
+                                      {'index': node['Index Name']}).scalar()
+            if root and root.startswith('ix_show_'):
+                scans.append(root)
+        elif node.get('Relation Name', '').startswith('show_') and node['Relation Name'] != 'show_default' \
+                and node['Node Type'] != 'Bitmap Heap Scan':
+            scans.append(node['Node Type'])
+    return scans
+
+
+def test_detail_page_shows_use_their_index(app, seed):
+    venue_ids, artist_ids = seed(venues=1000, artists=1000)
+    ids = {'venue': venue_ids[500], 'artist': artist_ids[500]}
+
+    with app.test_request_context():
+        add_history(venue_ids, artist_ids)
+        for page, (model, key, other, other_key, index) in sorted(PAGES.items()):
+            for since in (partitions.shows_since(), datetime.now()):
+                # shaped like the query of show_venue/show_artist
+                statement = select(model.id, Show.id, Show.start_time, other.name) \
+                    .outerjoin(Show, and_(key == model.id, Show.start_time > since)) \
+                    .outerjoin(other, other_key == other.id) \
+                    .where(model.id == ids[page])
+                scans = show_scans(statement)
+
+                # the month the window starts in may be read through the
+                # start_time index instead, when few of its rows are in it
+                assert 'Seq Scan' not in scans, (page, since, scans)
+                assert set(scans) <= {index, 'ix_show_start_time_id'}, (page, since, scans)
+                assert scans.count(index) >= len(scans) - 1, (page, since, scans)
@@ -0,0 +1,38 @@
+CITIES = (('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'))
+
+
+def test_directory_query_count_does_not_grow_with_venues(client, seed, statements):
+    counts = []
+    for venues in (15, 135):
+        seed(venues=venues, artists=5, shows=venues, cities=CITIES)
+        statements.clear()
+        response = client.get('/venues')
+        assert response.status_code == 200
+        counts.append(len(statements))
+
+    # 15 venues, then 150: the page lists them all from the same statements
+    assert b'Venue 134' in response.data
+    assert counts[0] == counts[1]
+
+
+def test_directory_groups_venues_by_area(client, seed):
+    seed(venues=6, artists=2, shows=12, cities=CITIES)
+    page = client.get('/venues').get_data(as_text=True)
+    for city, state in CITIES:
+        assert page.count('{}, {}'.format(city, state)) == 1
+
+
+def test_directory_pages_through_venues_without_an_area(app, client, seed, monkeypatch):
+    # a venue without a city or state must neither end the listing early nor
+    # be skipped when the pages are walked with the after= cursor
+    import re
+    monkeypatch.setitem(app.config, 'VENUES_PER_PAGE', 2)
+    seed(venues=7, cities=((None, None), ('Austin', 'TX')))
+
+    names, path = [], '/venues'
+    while path:
+        page = client.get(path).get_data(as_text=True)
+        names += re.findall(r'Venue \d+', page)
+        cursor = re.search(r'after=(\d+)', page)
+        path = '/venues?after={}'.format(cursor.group(1)) if cursor else None
+    assert sorted(names) == ['Venue {}'.format(n) for n in range(7)]
@@ -0,0 +1,67 @@
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from forms import ShowForm
+from models import db, Show
+from cache import cache
+import bookings
+import importer
+
+#----------------------------------------------------------------------------#
+# Tours.
+#----------------------------------------------------------------------------#
+
+# a tour is many shows of one artist listed at once. The dates are checked
+# the way `flask import` checks a batch (one query for the venue and artist
+# ids, one for overlaps with booked shows, overlaps among the dates in
+# memory), and those that pass are written with one multi-row INSERT in one
+# transaction. Dates that fail are reported by line; the others still go in.
+
+RULES = importer.form_rules(ShowForm)
+
+# a show booked elsewhere between the check and the INSERT fails the whole
+# INSERT; the dates are then checked again, now seeing that show
+ATTEMPTS = 3
+
+
+def insert_shows(batch):
+    # {line: show id}; accepted dates never share a venue and start time,
+    # so that pair matches the returned ids to their lines
+    statement = insert(Show.__table__).values([
+        {key: values[key] for key in ('artist_id', 'venue_id', 'start_time', 'duration_minutes')}
+        for line_num, values in batch
+    ]).returning(Show.id, Show.venue_id, Show.start_time)
+    ids = {(venue_id, start_time): id for id, venue_id, start_time in db.session.execute(statement)}
+    return {line_num: ids[values['venue_id'], values['start_time']] for line_num, values in batch}
+
+
+def schedule(artist_id, dates, duration_minutes=None):
+    # dates are (line, row) with venue_id, start_time and optionally their
+    # own duration_minutes; returns ({line: show id}, [(line, message)])
+    batch, invalid = [], []
+    for line_num, row in dates:
+        row = dict(row, artist_id=artist_id, id=None)
+        if row.get('duration_minutes') in (None, ''):
+            row['duration_minutes'] = duration_minutes
+        try:
+            batch.append((line_num, importer.show_values(row, RULES)))
+        except importer.RowError as error:
+            invalid.append((line_num, str(error)))
+
+    for attempt in range(ATTEMPTS):
+        accepted, rejected = importer.check_shows(batch) if batch else ([], [])
+        rows = [values for line_num, values in accepted]
+        try:
+            created = insert_shows(accepted) if accepted else {}
+            if rows:
+                importer.refresh_summaries('shows', rows, None)
+            db.session.commit()
+        except IntegrityError as error:
+            db.session.rollback()
+            if bookings.conflict(error) is None or attempt == ATTEMPTS - 1:
+                raise
+            continue
+        break
+
+    if rows:
+        cache.invalidate(*importer.tags_for('shows', rows))
+    return created, sorted(invalid + rejected)
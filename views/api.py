@@ -0,0 +1,486 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import json
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache
+from flask import Blueprint, current_app, request, Response, abort, url_for
+from werkzeug.exceptions import HTTPException
+from sqlalchemy import and_, func, literal, select, tuple_, union_all
+from sqlalchemy.exc import IntegrityError
+from models import db, Artist, Venue, Show, ShowBooking
+from cache import cache
+from routing import use_replica
+from exporter import to_json
+from views.shows import parse_show_cursor
+import importer
+import search
+import bookings
+import counters
+import directory
+import recommendations
+import tours
+
+blueprint = Blueprint('api', __name__, url_prefix='/api/v1')
+
+#  Resources
+#  ----------------------------------------------------------------
+
+# a resource maps its public field names to columns. ?fields= picks the
+# columns that are selected, and every row goes straight from the result
+# tuple into a namedtuple of exactly those fields; no ORM object is built.
+# List responses are {"data": [...], "next": <cursor or null>}, continued
+# with ?after=<cursor>.
+
+Resource = namedtuple('Resource', 'model columns list_fields')
+
+
+def columns_of(model, *names):
+  return {name: getattr(model, name) for name in names}
+
+
+RESOURCES = {
+  'venues': Resource(Venue, columns_of(
+      Venue, 'id', 'name', 'city', 'state', 'address', 'phone', 'genres', 'website', 'image_link',
+      'facebook_link', 'seeking_talent', 'seeking_description', 'upcoming_shows_count', 'past_shows_count'
+    ), ('id', 'name', 'city', 'state', 'upcoming_shows_count')),
+  'artists': Resource(Artist, columns_of(
+      Artist, 'id', 'name', 'city', 'state', 'phone', 'genres', 'website', 'image_link',
+      'facebook_link', 'seeking_venue', 'seeking_description', 'upcoming_shows_count', 'past_shows_count'
+    ), ('id', 'name', 'city', 'state', 'upcoming_shows_count')),
+  # show rows carry the venue and artist names, joined only when asked for
+  'shows': Resource(Show, dict(
+      id=Show.id, start_time=Show.start_time, duration_minutes=Show.duration_minutes,
+      venue_id=Show.venue_id, venue_name=Venue.name, venue_image_link=Venue.image_link,
+      artist_id=Show.artist_id, artist_name=Artist.name, artist_image_link=Artist.image_link
+    ), ('id', 'start_time', 'duration_minutes', 'venue_id', 'venue_name', 'artist_id', 'artist_name', 'artist_image_link')),
+}
+
+# the shows holding a venue or artist during an availability window
+BOOKING_FIELDS = ('show_id', 'start_time', 'end_time', 'venue_id', 'artist_id')
+BOOKING_KEYS = {'venues': ShowBooking.venue_id, 'artists': ShowBooking.artist_id}
+
+
+@lru_cache(maxsize=256)
+def dto(kind, fields):
+  # one namedtuple class per resource and field selection
+  return namedtuple(kind.capitalize() + 'DTO', fields)
+
+
+def selected_fields(resource, args, default):
+  # ?fields=id,name in the resource's own field order; unknown names are a 400
+  if not args.get('fields'):
+    return default
+  fields = set(name.strip() for name in args['fields'].split(',') if name.strip())
+  unknown = fields - set(resource.columns)
+  if unknown or not fields:
+    abort(400, description='unknown fields: {}'.format(', '.join(sorted(unknown))))
+  return tuple(name for name in resource.columns if name in fields)
+
+
+def argument(args, name, parse):
+  # the query argument parsed with parse, None when absent; a bad value is a 400
+  value = args.get(name)
+  if not value:
+    return None
+  try:
+    return parse(value)
+  except ValueError:
+    abort(400, description='{}: not a valid value'.format(name))
+
+
+def page_size(args, config):
+  limit = argument(args, 'limit', int) or config.get('API_PAGE_SIZE', 50)
+  return max(1, min(limit, config.get('API_MAX_PAGE_SIZE', 500)))
+
+
+def select_fields(kind, fields, *keys):
+  # the requested columns, then the keys the caller needs whatever was
+  # requested (cursor, cache tags); the DTO only takes the first len(fields)
+  resource = RESOURCES[kind]
+  statement = select(*(resource.columns[name] for name in fields), *keys).select_from(resource.model)
+  if kind == 'shows':
+    tables = set(column.table for column in statement.selected_columns)
+    if Venue.__table__ in tables:
+      statement = statement.join(Venue, Show.venue_id == Venue.id)
+    if Artist.__table__ in tables:
+      statement = statement.join(Artist, Show.artist_id == Artist.id)
+  return statement
+
+
+def serialize(kind, fields, rows):
+  make = dto(kind, fields)._make
+  size = len(fields)
+  return [make(row[:size])._asdict() for row in rows]
+
+
+def dumps(body):
+  return json.dumps(body, default=to_json)
+
+
+def json_response(body, status=200, headers=None):
+  return Response(dumps(body), status=status, headers=headers, mimetype='application/json')
+
+
+def api_error(error):
+  return json_response({'error': error.description}, error.code)
+
+# by code as well, or the app's HTML 404 and 500 pages would win
+for code_or_exception in (HTTPException, 404, 500):
+  blueprint.register_error_handler(code_or_exception, api_error)
+
+#  Queries
+#  ----------------------------------------------------------------
+
+# each GET is a statement built from the query arguments and a body built
+# from its rows, with no request or session in between, so the async read
+# path (async_app.py) runs the same statements on its own engine
+
+def people_query(kind, args, config):
+  # venues and artists in id order, optionally of one genre
+  resource = RESOURCES[kind]
+  model = resource.model
+  fields = selected_fields(resource, args, resource.list_fields)
+  limit = page_size(args, config)
+  genre = argument(args, 'genre', search.canonical_genre)
+  after = argument(args, 'after', int)
+
+  statement = select_fields(kind, fields, model.id)
+  if genre:
+    statement = statement.where(search.genre_filter(model, genre))
+  if after:
+    statement = statement.where(model.id > after)
+  return statement.order_by(model.id).limit(limit + 1), fields, limit
+
+
+def people_page(kind, fields, limit, rows):
+  next_cursor = None
+  if len(rows) > limit:
+    rows = rows[:limit]
+    next_cursor = rows[-1][-1]
+  return {'data': serialize(kind, fields, rows), 'next': next_cursor}
+
+
+def shows_query(args, config):
+  # shows in start time order; ?from=, ?to=, ?venue_id= and ?artist_id= filter them
+  resource = RESOURCES['shows']
+  fields = selected_fields(resource, args, resource.list_fields)
+  limit = page_size(args, config)
+  date_from = argument(args, 'from', datetime.fromisoformat)
+  date_to = argument(args, 'to', datetime.fromisoformat)
+  venue_id = argument(args, 'venue_id', int)
+  artist_id = argument(args, 'artist_id', int)
+  after = argument(args, 'after', parse_show_cursor)
+
+  statement = select_fields('shows', fields, Show.start_time, Show.id, Show.venue_id, Show.artist_id)
+  if date_from:
+    statement = statement.where(Show.start_time >= date_from)
+  if date_to:
+    statement = statement.where(Show.start_time < date_to)
+  if venue_id:
+    statement = statement.where(Show.venue_id == venue_id)
+  if artist_id:
+    statement = statement.where(Show.artist_id == artist_id)
+  if after:
+    statement = statement.where(tuple_(Show.start_time, Show.id) > tuple_(*after))
+  return statement.order_by(Show.start_time, Show.id).limit(limit + 1), fields, limit
+
+
+def shows_page(fields, limit, rows):
+  next_cursor = None
+  if len(rows) > limit:
+    rows = rows[:limit]
+    next_cursor = '{},{}'.format(rows[-1][-4].isoformat(), rows[-1][-3])
+  return {'data': serialize('shows', fields, rows), 'next': next_cursor}
+
+
+def search_query(kind, args, config):
+  # the ranked, index-backed match behind the HTML search, as a GET
+  resource = RESOURCES[kind]
+  model = resource.model
+  term = args.get('q', '').strip()
+  fields = selected_fields(resource, args, resource.list_fields)
+
+  statement = select_fields(kind, fields) \
+    .where(search.search_filter(model, term)) \
+    .order_by(search.rank(model, term).desc(), model.name) \
+    .limit(config.get('SEARCH_RESULTS_LIMIT', 50))
+  return statement, fields
+
+
+def search_page(kind, fields, rows):
+  return {'count': len(rows), 'data': serialize(kind, fields, rows)}
+
+
+def detail_query(kind, id, args):
+  # every field by default; a venue's or artist's shows are listed by
+  # /shows?venue_id= and /shows?artist_id=
+  resource = RESOURCES[kind]
+  fields = selected_fields(resource, args, tuple(resource.columns))
+  return select_fields(kind, fields).where(resource.model.id == id), fields
+
+
+def detail_body(kind, id, fields, rows):
+  if not rows:
+    abort(404, description='{} {} not found'.format(kind[:-1], id))
+  return serialize(kind, fields, rows[:1])[0]
+
+
+def availability_query(kind, id, args, config):
+  # is the venue or artist free over [from, to): one probe of the GiST
+  # index behind show_booking's exclusion constraint. The outer join keeps
+  # the venue or artist row, so an unknown id has no rows and a free one
+  # a single row without a show
+  model = RESOURCES[kind].model
+  start = argument(args, 'from', datetime.fromisoformat)
+  end = argument(args, 'to', datetime.fromisoformat)
+  if not start or not end or start >= end:
+    abort(400, description='from and to are required, from before to')
+
+  overlapping = and_(BOOKING_KEYS[kind] == model.id, ShowBooking.during.overlaps(func.tsrange(start, end)))
+  statement = select(
+      ShowBooking.show_id, func.lower(ShowBooking.during), func.upper(ShowBooking.during),
+      ShowBooking.venue_id, ShowBooking.artist_id
+    ).select_from(model) \
+    .outerjoin(ShowBooking, overlapping) \
+    .where(model.id == id) \
+    .order_by(ShowBooking.during) \
+    .limit(page_size(args, config))
+  return statement, start, end
+
+
+def recommendations_query(kind, id):
+  # the lists plus a row for the venue or artist itself, which tells an
+  # unknown id from one without recommendations, in one statement
+  model = RESOURCES[kind].model
+  subject = select(literal('subject'), literal(0), model.id, model.name, model.image_link, literal(0.0)) \
+    .where(model.id == id)
+  return union_all(subject, recommendations.lookup(kind, id))
+
+
+def recommendations_body(kind, id, rows):
+  if not any(row[0] == 'subject' for row in rows):
+    abort(404, description='{} {} not found'.format(kind[:-1], id))
+  return dict({kind[:-1] + '_id': id}, **recommendations.group(kind, rows))
+
+
+def availability_body(kind, id, start, end, rows):
+  if not rows:
+    abort(404, description='{} {} not found'.format(kind[:-1], id))
+  conflicts = serialize('bookings', BOOKING_FIELDS, [row for row in rows if row[0] is not None])
+  return {kind[:-1] + '_id': id, 'from': start, 'to': end, 'available': not conflicts, 'conflicts': conflicts}
+
+#  Lists
+#  ----------------------------------------------------------------
+
+def list_people(kind):
+  statement, fields, limit = people_query(kind, request.args, current_app.config)
+  rows = db.session.execute(statement).all()
+  return json_response(people_page(kind, fields, limit, rows))
+
+
+@blueprint.route('/venues')
+@use_replica
+@cache.cached('venues')
+def venues():
+  return list_people('venues')
+
+
+@blueprint.route('/artists')
+@use_replica
+@cache.cached('artists')
+def artists():
+  return list_people('artists')
+
+
+@blueprint.route('/shows')
+@use_replica
+@cache.cached('shows')
+def shows():
+  statement, fields, limit = shows_query(request.args, current_app.config)
+  rows = db.session.execute(statement).all()
+  body = shows_page(fields, limit, rows)
+
+  # rows may carry venue and artist names, see the /shows page
+  cache.tag(*('venue:{}'.format(row[-2]) for row in rows[:limit]))
+  cache.tag(*('artist:{}'.format(row[-1]) for row in rows[:limit]))
+  return json_response(body)
+
+#  Search
+#  ----------------------------------------------------------------
+
+def search_people(kind):
+  statement, fields = search_query(kind, request.args, current_app.config)
+  return json_response(search_page(kind, fields, db.session.execute(statement).all()))
+
+
+@blueprint.route('/venues/search')
+@use_replica
+def search_venues():
+  return search_people('venues')
+
+
+@blueprint.route('/artists/search')
+@use_replica
+def search_artists():
+  return search_people('artists')
+
+#  Details
+#  ----------------------------------------------------------------
+
+def detail(kind, id, status=200, headers=None):
+  statement, fields = detail_query(kind, id, request.args)
+  body = detail_body(kind, id, fields, db.session.execute(statement).all())
+  return json_response(body, status, headers)
+
+
+@blueprint.route('/venues/<int:venue_id>')
+@use_replica
+@cache.cached('venue:{venue_id}')
+def show_venue(venue_id):
+  return detail('venues', venue_id)
+
+
+@blueprint.route('/artists/<int:artist_id>')
+@use_replica
+@cache.cached('artist:{artist_id}')
+def show_artist(artist_id):
+  return detail('artists', artist_id)
+
+
+@blueprint.route('/shows/<int:show_id>')
+@use_replica
+def show_show(show_id):
+  return detail('shows', show_id)
+
+#  Recommendations
+#  ----------------------------------------------------------------
+
+def recommended(kind, id):
+  cache.tag('recommendations')
+  body = recommendations_body(kind, id, db.session.execute(recommendations_query(kind, id)).all())
+  cache.tag(*recommendations.tags({name: items for name, items in body.items() if name in recommendations.LISTS[kind]}))
+  return json_response(body)
+
+
+@blueprint.route('/venues/<int:venue_id>/recommendations')
+@use_replica
+@cache.cached('venue:{venue_id}')
+def venue_recommendations(venue_id):
+  return recommended('venues', venue_id)
+
+
+@blueprint.route('/artists/<int:artist_id>/recommendations')
+@use_replica
+@cache.cached('artist:{artist_id}')
+def artist_recommendations(artist_id):
+  return recommended('artists', artist_id)
+
+#  Availability
+#  ----------------------------------------------------------------
+
+def availability(kind, id):
+  statement, start, end = availability_query(kind, id, request.args, current_app.config)
+  return json_response(availability_body(kind, id, start, end, db.session.execute(statement).all()))
+
+
+@blueprint.route('/venues/<int:venue_id>/availability')
+@use_replica
+@cache.cached('venue:{venue_id}')
+def venue_availability(venue_id):
+  return availability('venues', venue_id)
+
+
+@blueprint.route('/artists/<int:artist_id>/availability')
+@use_replica
+@cache.cached('artist:{artist_id}')
+def artist_availability(artist_id):
+  return availability('artists', artist_id)
+
+#  Create
+#  ----------------------------------------------------------------
+
+# a JSON body is checked against the same form rules as `flask import`;
+# ids are always assigned by the database
+RULES = {kind: importer.form_rules(form_class) for kind, (model, form_class, to_values) in importer.IMPORTERS.items()}
+
+
+def create(kind):
+  model, form_class, to_values = importer.IMPORTERS[kind]
+  row = request.get_json(force=True, silent=True)
+  if not isinstance(row, dict):
+    abort(400, description='expected a JSON object')
+  row = dict(row, id=None)
+  try:
+    values = to_values(row, RULES[kind])
+  except importer.RowError as error:
+    abort(400, description=str(error))
+
+  if kind == 'shows':
+    known_venues, known_artists = importer.known_references([values])
+    if values['venue_id'] not in known_venues or values['artist_id'] not in known_artists:
+      abort(400, description='unknown venue_id or artist_id')
+
+  record = model(**{column.name: values[column.name] for column in model.__table__.columns
+                    if column.name in values and column.name != 'id'})
+  db.session.add(record)
+  try:
+    if kind == 'shows':
+      counters.add_show(record)
+      directory.refresh_venues([record.venue_id])
+    elif kind == 'venues':
+      db.session.flush()
+      directory.refresh_venues([record.id])
+    else:
+      db.session.flush()
+    db.session.commit()
+  except IntegrityError as error:
+    db.session.rollback()
+    # a show overlapping another of its venue or artist
+    conflict = bookings.conflict(error)
+    if conflict is None:
+      raise
+    abort(409, description='the {} is already booked at that time'.format(conflict))
+  values['id'] = record.id
+  cache.invalidate(*importer.tags_for(kind, [values]))
+
+  location = url_for('api.show_' + kind[:-1], **{kind[:-1] + '_id': record.id})
+  return detail(kind, record.id, 201, {'Location': location})
+
+
+@blueprint.route('/venues', methods=['POST'])
+def create_venue():
+  return create('venues')
+
+
+@blueprint.route('/artists', methods=['POST'])
+def create_artist():
+  return create('artists')
+
+
+@blueprint.route('/shows', methods=['POST'])
+def create_show():
+  return create('shows')
+
+
+@blueprint.route('/shows/batch', methods=['POST'])
+def create_shows_batch():
+  # one artist's tour: {"artist_id", "duration_minutes", "dates": [{"venue_id",
+  # "start_time", "duration_minutes"}]}; each date is created or reported by
+  # its line, its 1-based position in dates
+  body = request.get_json(force=True, silent=True)
+  limit = current_app.config.get('TOUR_MAX_DATES', 500)
+  if not isinstance(body, dict) or not isinstance(body.get('dates'), list):
+    abort(400, description='expected a JSON object with a dates list')
+  if not 0 < len(body['dates']) <= limit:
+    abort(400, description='dates: between 1 and {} dates'.format(limit))
+  if not all(isinstance(date, dict) for date in body['dates']):
+    abort(400, description='dates: expected JSON objects')
+
+  created, failures = tours.schedule(body.get('artist_id'), enumerate(body['dates'], start=1), body.get('duration_minutes'))
+  return json_response({
+    'created': [{'line': line_num, 'id': id} for line_num, id in sorted(created.items())],
+    'failed': [{'line': line_num, 'error': message} for line_num, message in failures],
+  })
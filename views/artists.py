@@ -0,0 +1,240 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import sys
+from datetime import datetime
+from flask import Blueprint, current_app, render_template, request, flash, redirect, url_for, abort
+from sqlalchemy import and_, func
+from sqlalchemy.orm import contains_eager
+from forms import ArtistForm
+from models import db, Artist, Venue, Show
+from cache import cache, conditional, changed_at
+from routing import use_replica
+import search
+import partitions
+import recommendations
+
+blueprint = Blueprint('artists', __name__)
+
+#  Artists
+#  ----------------------------------------------------------------
+@blueprint.route('/artists')
+@use_replica
+@cache.cached('artists')
+def artists():
+  data = []
+  per_page = current_app.config.get('ARTISTS_PER_PAGE', 100)
+
+  # browse by genre: /artists?genre=Jazz
+  try:
+    genre = search.canonical_genre(request.args['genre']) if request.args.get('genre') else None
+    after = int(request.args['after']) if request.args.get('after') else None
+  except ValueError:
+    abort(400)
+
+  # fetch artists data, one page at a time in id order
+  query = db.session.query(Artist.id, Artist.name)
+  if genre:
+    query = query.filter(search.genre_filter(Artist, genre))
+  if after:
+    query = query.filter(Artist.id > after)
+  artists = query.order_by(Artist.id).limit(per_page + 1).all()
+
+  next_cursor = None
+  if len(artists) > per_page:
+    artists = artists[:per_page]
+    next_cursor = artists[-1].id
+
+  # append the initially declared data list
+  for artist in artists:
+    data.append(
+      {
+        "id": artist.id,
+        "name": artist.name
+      }
+    )
+  return render_template('/pages/artists.html', artists=data, genre=genre, next_cursor=next_cursor)
+
+@blueprint.route('/artists/search', methods=['POST'])
+@use_replica
+def search_artists():
+  # get the search term from the form
+  search_term = request.form.get('search_term', '')
+
+  # ranked, index-backed match on name, city and genre with upcoming show counts
+  search_results = search.artists(search_term, limit=current_app.config.get('SEARCH_RESULTS_LIMIT', 50))
+
+  # assign the results to the below variables to be passed into the search artist page
+  response = {}
+  response['count'] = len(search_results)
+  response['data'] = search_results
+
+  return render_template('/pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+  
+
+
+def artist_state(artist_id):
+  # everything the artist page depends on, aggregated without loading it
+  now = datetime.now()
+  state = db.session.query(
+      func.greatest(Artist.updated_at, func.max(Show.updated_at), func.max(Venue.updated_at),
+                    recommendations.modified('artists', artist_id)),
+      func.count(Show.id),
+      func.count(Show.id).filter(Show.start_time <= now),
+      func.max(Show.start_time).filter(Show.start_time <= now)
+    ).outerjoin(Show, and_(Show.artist_id == Artist.id, Show.start_time > partitions.shows_since())) \
+    .outerjoin(Venue, Show.venue_id == Venue.id) \
+    .filter(Artist.id == artist_id) \
+    .group_by(Artist.id) \
+    .first()
+  if state is None:
+    return None
+  return (changed_at(state[0], state[3]),) + tuple(state[1:])
+
+
+@blueprint.route('/artists/<int:artist_id>')
+@use_replica
+@conditional(artist_state)
+@cache.cached('artist:{artist_id}')
+def show_artist(artist_id):
+  # load the artist with its recent and upcoming shows and their venues in a
+  # single joined query; the totals come from the artist's show counters
+  since = partitions.shows_since()
+  artist = Artist.query \
+    .outerjoin(Show, and_(Show.artist_id == Artist.id, Show.start_time > since)) \
+    .outerjoin(Venue, Show.venue_id == Venue.id) \
+    .options(contains_eager(Artist.shows).contains_eager(Show.venue)) \
+    .filter(Artist.id == artist_id) \
+    .one_or_none()
+  if artist is None:
+    abort(404)
+
+  # declare variables
+  past_shows = []
+  upcoming_shows = []
+  now = datetime.now()
+
+  for show in sorted(artist.shows, key=lambda show: show.start_time):
+    data = {
+      'venue_id': show.venue_id,
+      'venue_name': show.venue.name,
+      'venue_image_link': show.venue.image_link,
+      'start_time': show.start_time
+    }
+    if show.start_time > now:
+      upcoming_shows.append(data)
+    else:
+      past_shows.append(data)
+
+  # the page also shows venue names and images, so it goes stale when they change
+  cache.tag(*('venue:{}'.format(show.venue_id) for show in artist.shows))
+
+  # discovery links, precomputed by `flask recommendations refresh`
+  lists = recommendations.fetch('artists', artist.id)
+  cache.tag(*recommendations.tags(lists))
+
+  data = {
+    'id': artist.id,
+    'name': artist.name,
+    'genres': artist.genres,
+    'city': artist.city,
+    'state': artist.state,
+    'phone': artist.phone,
+    'facebook_link': artist.facebook_link,
+    'image_link': artist.image_link,
+    'past_shows': past_shows,
+    'upcoming_shows': upcoming_shows,
+    'past_shows_count': artist.past_shows_count,
+    # the list stops at the window, the count does not: older shows are
+    # left to the API
+    'past_shows_days': current_app.config.get('PAST_SHOWS_DAYS', 365),
+    'earlier_shows_url': url_for('api.shows', artist_id=artist.id, to=since.isoformat()),
+    'upcoming_shows_count': artist.upcoming_shows_count,
+    'website': artist.website,
+    'similar_artists': lists['similar_artists'],
+    'fitting_venues': lists['fitting_venues']
+  }
+
+  return render_template('/pages/show_artist.html', artist=data)
+
+
+#  Update
+#  ----------------------------------------------------------------
+@blueprint.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+
+  # fetch data and pre-populate form fields
+  artist = Artist.query.get(artist_id)
+  form = ArtistForm(obj=artist)
+
+  return render_template('/forms/edit_artist.html', form=form, artist=artist)
+
+
+
+@blueprint.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  artist = Artist.query.get(artist_id)
+  
+  try:
+    artist = Artist.query.filter_by(id=artist_id).all()[0]
+
+    artist.name = request.form.get('name')
+    artist.city = request.form.get('city')
+    artist.state = request.form.get('state')
+    artist.phone = request.form.get('phone')
+    artist.genres = request.form.getlist('genres')
+    artist.facebook_link = request.form.get('facebook_link')
+    artist.website = request.form.get('website_link')
+    artist.image_link = request.form.get('image_link')
+    artist.seeking_venue = request.form.get('seeking_venue') == 'True'
+    artist.seeking_description =request.form.get('seeking_description')
+
+    db.session.commit()
+    cache.invalidate('artists', 'artist:{}'.format(artist_id))
+  except:
+    db.session.rollback()
+    flash('An error occurred. Artist could not be updated')
+  finally:
+    db.session.close()
+
+  return redirect(url_for('.show_artist', artist_id=artist_id))
+
+
+@blueprint.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+@blueprint.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  # form = ArtistForm()
+  error = False
+  try:
+      artist = Artist()
+      artist.name = request.form.get('name')
+      artist.city = request.form.get('city')
+      artist.state = request.form.get('state')
+      artist.phone = request.form.get('phone')
+      artist.genres = request.form.getlist('genres')
+      # artist.genres = ','.join(genre_list)
+      artist.website = request.form.get('website')
+      artist.image_link = request.form.get('image_link')
+      artist.facebook_link = request.form.get('facebook_link')
+      artist.seeking_description = request.form.get('seeking_description')
+      db.session.add(artist)
+      db.session.commit()
+      cache.invalidate('artists')
+  except:
+      error = True
+      db.session.rollback()
+      print(sys.exc_info())
+  finally:
+      db.session.close()
+      if error:
+          flash('An error occurred. Artist ' +
+                request.form['name'] + ' could not be listed.')
+      else:
+          flash('Artist ' + request.form['name'] +
+                ' was successfully listed!')
+      return render_template('pages/home.html')
@@ -0,0 +1,187 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import sys
+from datetime import datetime
+from flask import Blueprint, current_app, render_template, request, Response, flash, abort, stream_with_context
+from flask.signals import before_render_template, template_rendered
+from sqlalchemy import tuple_
+from forms import ShowForm, TourForm
+from models import db, Artist, Venue, Show, SHOW_MINUTES
+from cache import cache
+from routing import use_replica
+import bookings
+import counters
+import directory
+import tours
+
+blueprint = Blueprint('shows', __name__)
+
+#  Shows
+#  ----------------------------------------------------------------
+
+def stream_template(template_name, **context):
+  # render the template lazily so the first chunk goes out before the page is complete
+  app = current_app._get_current_object()
+  app.update_template_context(context)
+  template = app.jinja_env.get_template(template_name)
+
+  def generate():
+    before_render_template.send(app, template=template, context=context)
+    yield from template.generate(context)
+    template_rendered.send(app, template=template, context=context)
+
+  return Response(stream_with_context(generate()))
+
+
+def parse_show_cursor(cursor):
+  # a cursor is "<start_time isoformat>,<show id>" of the last show on the previous page
+  start_time, show_id = cursor.rsplit(',', 1)
+  return datetime.fromisoformat(start_time), int(show_id)
+
+
+@blueprint.route('/shows')
+@use_replica
+@cache.cached('shows')
+def shows():
+  per_page = current_app.config.get('SHOWS_PER_PAGE', 30)
+
+  try:
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    after = request.args.get('after')
+    date_from = datetime.fromisoformat(date_from) if date_from else None
+    date_to = datetime.fromisoformat(date_to) if date_to else None
+    after = parse_show_cursor(after) if after else None
+  except ValueError:
+    abort(400)
+
+  # select only the columns the page needs, joining venue and artist in the same query
+  query = db.session.query(
+      Show.id, Show.start_time,
+      Venue.id.label('venue_id'), Venue.name.label('venue_name'),
+      Artist.id.label('artist_id'), Artist.name.label('artist_name'),
+      Artist.image_link.label('artist_image_link')
+    ).join(Venue, Show.venue_id == Venue.id) \
+    .join(Artist, Show.artist_id == Artist.id)
+
+  if date_from:
+    query = query.filter(Show.start_time >= date_from)
+  if date_to:
+    query = query.filter(Show.start_time < date_to)
+  if after:
+    # keyset pagination: continue right after the last (start_time, id) already shown
+    query = query.filter(tuple_(Show.start_time, Show.id) > tuple_(*after))
+
+  # fetch one extra row to find out whether there is a next page
+  rows = query.order_by(Show.start_time, Show.id).limit(per_page + 1).all()
+
+  next_cursor = None
+  if len(rows) > per_page:
+    rows = rows[:per_page]
+    next_cursor = '{},{}'.format(rows[-1].start_time.isoformat(), rows[-1].id)
+
+  # the listing shows venue and artist names, so it goes stale when any of them change
+  cache.tag(*('venue:{}'.format(show.venue_id) for show in rows))
+  cache.tag(*('artist:{}'.format(show.artist_id) for show in rows))
+
+  data = ({
+      'venue_id': show.venue_id,
+      'venue_name': show.venue_name,
+      'artist_id': show.artist_id,
+      'artist_name': show.artist_name,
+      'artist_image_link': show.artist_image_link,
+      'start_time': show.start_time
+    } for show in rows)
+
+  filters = {key: request.args[key] for key in ('from', 'to') if request.args.get(key)}
+
+  return stream_template('/pages/shows.html', shows=data, next_cursor=next_cursor, filters=filters)
+
+@blueprint.route('/shows/create')
+def create_shows():
+  # renders form. do not touch.
+  form = ShowForm()
+  return render_template('/forms/new_show.html', form=form)
+
+@blueprint.route('/shows/create', methods=['POST'])
+def create_show_submission():
+
+  # the form's NumberRange: a zero or negative duration books nothing
+  form = ShowForm(request.form)
+  if not form.duration_minutes.validate(form):
+    flash('Duration: {} Show could not be listed'.format(form.duration_minutes.errors[-1]))
+    return render_template('/pages/home.html')
+
+  error = False
+  conflict = None
+  try:
+      show = Show()
+      show.artist_id = request.form['artist_id']
+      show.venue_id = request.form['venue_id']
+      show.start_time = request.form['start_time']
+      show.duration_minutes = form.duration_minutes.data or SHOW_MINUTES
+      db.session.add(show)
+      counters.add_show(show)
+      directory.refresh_venues([show.venue_id])
+      db.session.commit()
+      cache.invalidate('shows', 'venues', 'venue:{}'.format(show.venue_id), 'artist:{}'.format(show.artist_id))
+  except:
+      error = True
+      # an overlap with another show of the venue or artist is rejected by show_booking
+      conflict = bookings.conflict(sys.exc_info()[1])
+      db.session.rollback()
+      print(sys.exc_info())
+  finally:
+      db.session.close()
+      if conflict:
+          flash('The {} is already booked at that time. Show could not be listed'.format(conflict))
+      elif error:
+          flash('An error occurred. Show could not be listed')
+      else:
+          flash('Show was successfully listed!')
+      return render_template('/pages/home.html')
+
+#  Tours
+#  ----------------------------------------------------------------
+
+def tour_dates(lines):
+  # (line, row) for each "venue_id, start_time[, duration_minutes]" line
+  for line_num, line in enumerate(lines, start=1):
+    if line.strip():
+      yield line_num, dict(zip(('venue_id', 'start_time', 'duration_minutes'), line.split(',')))
+
+@blueprint.route('/shows/tour')
+def create_tour():
+  form = TourForm()
+  return render_template('/forms/new_tour.html', form=form, failures=[])
+
+@blueprint.route('/shows/tour', methods=['POST'])
+def create_tour_submission():
+  # every date is listed or reported in one post; the form comes back with
+  # only the dates that failed, to be fixed and posted again
+  form = TourForm(request.form)
+  lines = request.form.get('dates', '').splitlines()
+  dates = list(tour_dates(lines))
+  if not dates or len(dates) > current_app.config.get('TOUR_MAX_DATES', 500):
+    flash('A tour needs between 1 and {} dates'.format(current_app.config.get('TOUR_MAX_DATES', 500)))
+    return render_template('/forms/new_tour.html', form=form, failures=[])
+
+  try:
+    created, failures = tours.schedule(request.form.get('artist_id'), dates, request.form.get('duration_minutes'))
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    flash('An error occurred. Tour could not be listed')
+    return render_template('/forms/new_tour.html', form=form, failures=[])
+  finally:
+    db.session.close()
+
+  if not failures:
+    flash('Tour was successfully listed: {} shows!'.format(len(created)))
+    return render_template('/pages/home.html')
+  flash('{} shows listed, {} could not be listed'.format(len(created), len(failures)))
+  form.dates.data = '\n'.join(lines[line_num - 1] for line_num, message in failures)
+  failures = [(lines[line_num - 1].strip(), message) for line_num, message in failures]
+  return render_template('/forms/new_tour.html', form=form, failures=failures)
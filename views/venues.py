@@ -0,0 +1,295 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import sys
+from datetime import datetime
+from flask import Blueprint, current_app, render_template, request, flash, redirect, url_for, abort
+from sqlalchemy import and_, func, select, tuple_
+from sqlalchemy.orm import contains_eager
+from forms import VenueForm
+from models import db, Artist, Venue, VenueDirectory, Show
+from cache import cache, conditional, changed_at
+from routing import use_replica
+import search
+import partitions
+import recommendations
+import directory
+
+blueprint = Blueprint('venues', __name__)
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@blueprint.route('/venues')
+@use_replica
+@cache.cached('venues')
+def venues():
+  data = []
+  per_page = current_app.config.get('VENUES_PER_PAGE', 200)
+
+  # browse by genre: /venues?genre=Jazz
+  try:
+    genre = search.canonical_genre(request.args['genre']) if request.args.get('genre') else None
+    after = int(request.args['after']) if request.args.get('after') else None
+  except ValueError:
+    abort(400)
+
+  # one index-ordered read of the precomputed directory (see directory.py)
+  area_order = (VenueDirectory.state, VenueDirectory.city, VenueDirectory.name, VenueDirectory.venue_id)
+  query = db.session.query(
+      VenueDirectory.venue_id.label('id'), VenueDirectory.name, VenueDirectory.city, VenueDirectory.state,
+      VenueDirectory.num_upcoming_shows
+    )
+  if genre:
+    query = query.filter(search.genre_filter(VenueDirectory, genre))
+  if after:
+    # keyset pagination: continue right after the last venue already shown,
+    # located by a row subquery on the primary key
+    last = select(*area_order).where(VenueDirectory.venue_id == after).scalar_subquery()
+    query = query.filter(tuple_(*area_order) > last)
+  venues = query.order_by(*area_order) \
+    .limit(per_page + 1) \
+    .all()
+
+  next_cursor = None
+  if len(venues) > per_page:
+    venues = venues[:per_page]
+    next_cursor = venues[-1].id
+
+  # rows arrive sorted by area, so a new area starts whenever city/state changes
+  for venue in venues:
+    if not data or data[-1]['city'] != venue.city or data[-1]['state'] != venue.state:
+      data.append({
+        "city": venue.city,
+        "state": venue.state,
+        "venues": []
+      })
+
+    data[-1]['venues'].append({
+      "id": venue.id,
+      "name": venue.name,
+      "num_upcoming_shows": venue.num_upcoming_shows
+    })
+
+  return render_template('pages/venues.html', areas=data, genre=genre, next_cursor=next_cursor)
+
+
+
+
+@blueprint.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  form = VenueForm()
+  return render_template('/forms/new_venue.html', form=form)
+
+@blueprint.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  error = False
+  try:
+    venue = Venue()
+    venue.name = request.form['name']
+    venue.city = request.form['city']
+    venue.state = request.form['state']
+    venue.address = request.form['address']
+    venue.phone = request.form['phone']
+    venue.image_link = request.form['image_link']
+    venue.genres = request.form.getlist('genres')
+    # get genre as a list
+    # genre_list = request.form.getlist('genres')
+    # convert the list to string seperated by ","
+    # venue.genres = ','.join(genre_list)
+    venue.facebook_link = request.form['facebook_link']
+    db.session.add(venue)
+    db.session.flush()
+    directory.refresh_venues([venue.id])
+    db.session.commit()
+    cache.invalidate('venues')
+    db.session.close()
+  except:
+    error = True
+    db.session.rollback()
+    print(sys.exc_info())
+  finally:
+    db.session.close()
+    if error:
+      flash('An error occurred. Venue ' + request.form['name'] + ' could not be listed.' )
+    else:
+      flash('Venue ' + request.form['name'] + ' was successfully listed!' )
+  return render_template('/pages/home.html')
+
+
+
+
+@blueprint.route('/venues/search', methods=['POST'])
+@use_replica
+def search_venues():
+  search_term = request.form.get('search_term', '')
+
+  # ranked, index-backed match on name, city and genre with upcoming show counts
+  venues = search.venues(search_term, limit=current_app.config.get('SEARCH_RESULTS_LIMIT', 50))
+
+  data = []
+  for venue in venues:
+      tmp = {}
+      tmp['id'] = venue.id
+      tmp['name'] = venue.name
+      tmp['num_upcoming_shows'] = venue.num_upcoming_shows
+      data.append(tmp)
+
+  response = {}
+  response['count'] = len(data)
+  response['data'] = data
+
+  return render_template('/pages/search_venues.html', results=response, search_term=search_term)
+
+
+
+
+def venue_state(venue_id):
+  # everything the venue page depends on, aggregated without loading it
+  now = datetime.now()
+  state = db.session.query(
+      func.greatest(Venue.updated_at, func.max(Show.updated_at), func.max(Artist.updated_at),
+                    recommendations.modified('venues', venue_id)),
+      func.count(Show.id),
+      func.count(Show.id).filter(Show.start_time <= now),
+      func.max(Show.start_time).filter(Show.start_time <= now)
+    ).outerjoin(Show, and_(Show.venue_id == Venue.id, Show.start_time > partitions.shows_since())) \
+    .outerjoin(Artist, Show.artist_id == Artist.id) \
+    .filter(Venue.id == venue_id) \
+    .group_by(Venue.id) \
+    .first()
+  if state is None:
+    return None
+  return (changed_at(state[0], state[3]),) + tuple(state[1:])
+
+
+@blueprint.route('/venues/<int:venue_id>')
+@use_replica
+@conditional(venue_state)
+@cache.cached('venue:{venue_id}')
+def show_venue(venue_id):
+  # load the venue with its recent and upcoming shows and their artists in a
+  # single joined query; the totals come from the venue's show counters
+  since = partitions.shows_since()
+  venue = Venue.query \
+    .outerjoin(Show, and_(Show.venue_id == Venue.id, Show.start_time > since)) \
+    .outerjoin(Artist, Show.artist_id == Artist.id) \
+    .options(contains_eager(Venue.shows).contains_eager(Show.artist)) \
+    .filter(Venue.id == venue_id) \
+    .one_or_none()
+  if venue is None:
+    abort(404)
+
+  # declare variables
+  past_shows = []
+  upcoming_shows = []
+  now = datetime.now()
+
+  for show in sorted(venue.shows, key=lambda show: show.start_time):
+    data = {
+      'artist_id': show.artist_id,
+      'artist_name': show.artist.name,
+      'artist_image_link': show.artist.image_link,
+      'start_time': show.start_time
+    }
+    if show.start_time > now:
+      upcoming_shows.append(data)
+    else:
+      past_shows.append(data)
+
+  # the page also shows artist names and images, so it goes stale when they change
+  cache.tag(*('artist:{}'.format(show.artist_id) for show in venue.shows))
+
+  # discovery links, precomputed by `flask recommendations refresh`
+  lists = recommendations.fetch('venues', venue.id)
+  cache.tag(*recommendations.tags(lists))
+
+  data = {
+    'id': venue.id,
+    'name': venue.name,
+    'genres': venue.genres,
+    'city': venue.city,
+    'state': venue.state,
+    'phone': venue.phone,
+    'facebook_link': venue.facebook_link,
+    'image_link': venue.image_link,
+    'past_shows': past_shows,
+    'upcoming_shows': upcoming_shows,
+    'past_shows_count': venue.past_shows_count,
+    # the list stops at the window, the count does not: older shows are
+    # left to the API
+    'past_shows_days': current_app.config.get('PAST_SHOWS_DAYS', 365),
+    'earlier_shows_url': url_for('api.shows', venue_id=venue.id, to=since.isoformat()),
+    'upcoming_shows_count': venue.upcoming_shows_count,
+    'website': venue.website,
+    'fitting_artists': lists['fitting_artists']
+  }
+
+  return render_template('pages/show_venue.html', venue=data)
+
+
+
+
+@blueprint.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  
+  # fetch data and pre-populated the form fields
+  venue = Venue.query.get(venue_id)
+  form = VenueForm(obj=venue)
+  return render_template('/forms/edit_venue.html', form=form, venue=venue)
+
+@blueprint.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  venue = Venue.query.get(venue_id)
+
+  error = False
+  try:
+      venue.name = request.form['name']
+      venue.city = request.form['city']
+      venue.state = request.form['state']
+      venue.address = request.form['address']
+      venue.phone = request.form['phone']
+      venue.genres = request.form.getlist('genres')
+      venue.facebook_link = request.form['facebook_link']
+      db.session.add(venue)
+      directory.refresh_venues([venue_id])
+      db.session.commit()
+      cache.invalidate('venues', 'venue:{}'.format(venue_id))
+  except:
+      error = True
+      db.session.rollback()
+      print(sys.exc_info())
+  finally:
+      db.session.close()
+      if error:
+        flash('An error occurred. Venue ' + request.form['name'] + ' could not be updated.')
+      else:
+        flash('Venue ' + request.form['name'] + ' was successfully updated!')
+  return redirect(url_for('.show_venue', venue_id=venue_id))
+
+
+
+
+@blueprint.route('/venues/<venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+  error = None
+
+  try:
+    Venue.query.filter_by(id=venue_id).delete()
+    db.session.commit()
+    cache.invalidate('venues', 'venue:{}'.format(venue_id))
+  except:
+    error = True
+    db.session.rollback()
+  finally:
+    db.session.close()
+
+  if error:
+    # flash error and return to home page
+    flash('An error occured')
+    return redirect(url_for('index'))
+  else:
+    # flash success and return to home page
+    flash('Venue successfully deleted')
+    return redirect(url_for('index'))